@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Локальный HTTP API прогнозов ИПЦ для React фронтенда
+
+Асинхронный сервер на asyncio (без внешних зависимостей):
+  GET /api/health
+  GET /api/series
+  GET /api/forecast?order=1,0,1&seasonal_order=1,0,1,12&steps=12[&start=...&end=...]
+  GET /api/diagnostics?order=1,0,1&seasonal_order=1,0,1,12[&start=...&end=...]
+  GET /api/inflation?start=2020-01&end=2024-12
+  GET /api/metrics        (метрики в формате Prometheus, при --metrics)
+
+Модели берутся из того же дискового кэша, что и в дашборде
+(modeling.fit_sarima_window), обучение идёт в пуле процессов.
+Готовые ответы хранятся в памяти вместе с gzip-версией и ETag,
+поддерживаются условные запросы (If-None-Match -> 304).
+Одинаковые запросы, пришедшие во время расчёта, ждут один общий расчёт.
+Порядки и окно обучения ограничены теми же пределами, что в дашборде;
+некорректные параметры — 400.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+
+import metrics
+from data import data_version, read_ipc
+from inflation import InflationIndex
+from modeling import compact_model, fit_sarima_window, forecast_sarima, residual_diagnostics
+
+MAX_STEPS = 120
+MAX_RESPONSES = 256
+MAX_HEADER_BYTES = 16 * 1024
+
+# Допустимые порядки — как в сайдбаре дашборда: верхние границы (p, d, q), (P, D, Q) и периоды s
+MAX_ORDER = (5, 2, 5)
+MAX_SEASONAL_ORDER = (3, 2, 3)
+SEASONAL_PERIODS = (12, 6, 4, 3)
+MIN_FIT_MONTHS = 36
+
+
+class BadRequest(ValueError):
+    """Некорректные параметры запроса"""
+
+
+def _ints(params, name, default):
+    try:
+        return tuple(int(v) for v in params.get(name, default).split(','))
+    except ValueError:
+        raise BadRequest(f'{name}: ожидаются целые числа через запятую')
+
+
+def _month(params, name, default, df):
+    """Месяц из параметра запроса в пределах ряда: 'YYYY-MM-DD' начала месяца"""
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        raise BadRequest(f'{name}: ожидается дата YYYY-MM или YYYY-MM-DD')
+    if ts is pd.NaT or not df.index[0] <= ts.to_period('M').to_timestamp() <= df.index[-1]:
+        raise BadRequest(f'{name}: вне ряда {_date(df.index[0])} — {_date(df.index[-1])}')
+    return _date(ts.to_period('M').to_timestamp())
+
+
+def _model_args(params, df):
+    order = _ints(params, 'order', '1,0,1')
+    seasonal_order = _ints(params, 'seasonal_order', '1,0,1,12')
+    if len(order) != 3 or len(seasonal_order) != 4:
+        raise BadRequest('order — 3 числа, seasonal_order — 4 числа')
+    if not all(0 <= v <= top for v, top in zip(order + seasonal_order[:3], MAX_ORDER + MAX_SEASONAL_ORDER)):
+        raise BadRequest('порядок вне допустимых границ: p, q <= 5; d, D <= 2; P, Q <= 3')
+    if seasonal_order[3] not in SEASONAL_PERIODS:
+        raise BadRequest(f"seasonal_order: s — одно из {', '.join(map(str, SEASONAL_PERIODS))}")
+    start = _month(params, 'start', _date(df.index[0]), df)
+    end = _month(params, 'end', _date(df.index[-1]), df)
+    if len(df[start:end]) < MIN_FIT_MONTHS:
+        raise BadRequest(f'start/end: для обучения нужно не меньше {MIN_FIT_MONTHS} месяцев')
+    return start, end, order, seasonal_order
+
+
+def _date(ts):
+    return ts.strftime('%Y-%m-%d')
+
+
+# --- Расчёты (выполняются в пуле процессов) ---
+
+# Возвращают (ответ, метрики процесса пула) — метрики сливаются в основной процесс
+
+def compute_forecast(start, end, order, seasonal_order, steps):
+    df = read_ipc()
+    model_fit = fit_sarima_window(df['ipc'], start, end, order, seasonal_order)
+    forecast, conf_int = forecast_sarima(model_fit, steps)
+    return {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'window': [start, end],
+        'aic': float(model_fit.aic),
+        'bic': float(model_fit.bic),
+        'forecast': [
+            {'date': _date(d), 'value': round(float(v), 4),
+             'lower': round(float(lo), 4), 'upper': round(float(hi), 4)}
+            for d, v, lo, hi in zip(forecast.index, forecast.values,
+                                    conf_int.iloc[:, 0].values, conf_int.iloc[:, 1].values)
+        ],
+    }, metrics.drain()
+
+
+def compute_diagnostics(start, end, order, seasonal_order):
+    df = read_ipc()
+    model_fit = fit_sarima_window(df['ipc'], start, end, order, seasonal_order)
+    return {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'window': [start, end],
+        **residual_diagnostics(compact_model(model_fit)),
+    }, metrics.drain()
+
+
+# --- HTTP ---
+
+class Response:
+    """Готовый ответ: тело, его gzip-версия и ETag каждой (payload-строка отдаётся как текст)"""
+
+    def __init__(self, payload, status=HTTPStatus.OK):
+        self.status = status
+        if isinstance(payload, str):
+            self.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            self.body = payload.encode('utf-8')
+        else:
+            self.content_type = 'application/json; charset=utf-8'
+            self.body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        # Разные представления — разные сильные ETag
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+def _etag_matches(header, etag):
+    """If-None-Match: список ETag через запятую или *; сравнение слабое (W/ не учитывается)"""
+    if header is None:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+class ForecastServer:
+    def __init__(self, workers):
+        ctx = multiprocessing.get_context('spawn')
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        self.version = None
+        self.df = None
+        self.inflation = None
+        self.responses = {}
+        self.inflight = {}
+
+    def _refresh_data(self):
+        """Перечитать данные, если изменилась их версия (сброс кэша ответов)"""
+        version = data_version()
+        if version != self.version:
+            self.df = read_ipc()
+            self.inflation = InflationIndex(self.df['ipc'])
+            self.version = version
+            self.responses.clear()
+
+    async def _cached(self, key, compute):
+        """Кэш ответов + объединение одинаковых запросов в один расчёт"""
+        if key in self.responses:
+            metrics.count('api.cache.hit')
+            return self.responses[key]
+        future = self.inflight.get(key)
+        if future is not None:
+            metrics.count('api.cache.joined')
+        else:
+            metrics.count('api.cache.miss')
+            future = asyncio.ensure_future(self._build(key, compute))
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield: отключение одного клиента не отменяет общий расчёт
+        return await asyncio.shield(future)
+
+    async def _build(self, key, compute):
+        response = Response(await compute())
+        if len(self.responses) >= MAX_RESPONSES:
+            self.responses.pop(next(iter(self.responses)))
+            metrics.count('api.cache.evict')
+        self.responses[key] = response
+        return response
+
+    async def _in_pool(self, func, *args):
+        payload, worker_metrics = await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+        metrics.merge(worker_metrics)
+        return payload
+
+    async def route(self, path, params):
+        self._refresh_data()
+        df = self.df
+
+        if path == '/api/health':
+            return Response({'status': 'ok', 'version': self.version})
+
+        if path == '/api/metrics':
+            if not metrics.enabled():
+                return Response({'error': 'metrics disabled (--metrics)'}, HTTPStatus.NOT_FOUND)
+            return Response(metrics.prometheus())
+
+        if path == '/api/series':
+            async def series():
+                return {'version': self.version,
+                        'data': [{'date': _date(d), 'value': float(v)} for d, v in df['ipc'].items()]}
+            return await self._cached(('series', self.version), series)
+
+        if path == '/api/forecast':
+            args = _model_args(params, df)
+            try:
+                steps = int(params.get('steps', 12))
+            except ValueError:
+                raise BadRequest('steps: ожидается целое число')
+            if not 1 <= steps <= MAX_STEPS:
+                raise BadRequest(f'steps: от 1 до {MAX_STEPS}')
+            key = ('forecast', self.version, *args, steps)
+            return await self._cached(key, lambda: self._in_pool(compute_forecast, *args, steps))
+
+        if path == '/api/inflation':
+            # O(1) по префиксному индексу — без пула и кэша ответов
+            start = _month(params, 'start', _date(df.index[0]), df)
+            end = _month(params, 'end', _date(df.index[-1]), df)
+            try:
+                cumulative = self.inflation.cumulative(start, end)
+                annualized = self.inflation.annualized(start, end)
+            except (KeyError, ValueError) as e:
+                raise BadRequest(f'start/end: {e.args[0]}')
+            return Response({
+                'start': pd.Timestamp(start).strftime('%Y-%m'),
+                'end': pd.Timestamp(end).strftime('%Y-%m'),
+                'months': self.inflation.position(end) - self.inflation.position(start) + 1,
+                'cumulative': round(cumulative, 4),
+                'annualized': round(annualized, 4),
+                'yoy_end': self.inflation.yoy(end),
+            })
+
+        if path == '/api/diagnostics':
+            args = _model_args(params, df)
+            key = ('diagnostics', self.version, *args)
+            return await self._cached(key, lambda: self._in_pool(compute_diagnostics, *args))
+
+        return Response({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                if method not in ('GET', 'HEAD'):
+                    response = Response({'error': 'method not allowed'}, HTTPStatus.METHOD_NOT_ALLOWED)
+                else:
+                    url = urlsplit(target)
+                    path = url.path.rstrip('/') or '/'
+                    try:
+                        with metrics.stage('api.request', path=path):
+                            response = await self.route(path, dict(parse_qsl(url.query)))
+                    except BadRequest as e:
+                        response = Response({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+                    except Exception as e:
+                        response = Response({'error': f'{type(e).__name__}: {e}'},
+                                            HTTPStatus.INTERNAL_SERVER_ERROR)
+
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                writer.write(self._render(method, headers, response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _render(method, headers, response, keep_alive):
+        status = response.status
+        body = response.body
+        extra = []
+        if status == HTTPStatus.OK:
+            gzipped = 'gzip' in headers.get('accept-encoding', '')
+            etag = response.gzip_etag if gzipped else response.etag
+            extra += [f'ETag: {etag}', 'Cache-Control: no-cache', 'Vary: Accept-Encoding']
+            if _etag_matches(headers.get('if-none-match'), etag):
+                status, body = HTTPStatus.NOT_MODIFIED, b''
+            elif gzipped:
+                body = response.gzipped
+                extra.append('Content-Encoding: gzip')
+        head = [
+            f'HTTP/1.1 {status.value} {status.phrase}',
+            f'Content-Type: {response.content_type}',
+            f'Content-Length: {len(body)}',
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            *extra,
+        ]
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+        return payload if method == 'HEAD' else payload + body
+
+
+async def serve(host, port, workers):
+    server = ForecastServer(workers)
+    tcp = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES)
+    print(f'API прогнозов ИПЦ: http://{host}:{port}/api/health')
+    async with tcp:
+        await tcp.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP API прогнозов ИПЦ')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=2, help='процессов для обучения моделей')
+    parser.add_argument('--metrics', action='store_true',
+                        help='метрики стадий: JSON-логи в stderr и /api/metrics')
+    args = parser.parse_args()
+    if args.metrics:
+        # Процессы пула (spawn) наследуют окружение и включают метрики при импорте
+        os.environ['IPC_METRICS'] = '1'
+        metrics.enable()
+    asyncio.run(serve(args.host, args.port, args.workers))
+
+
+if __name__ == "__main__":
+    main()
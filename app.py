@@ -6,16 +6,32 @@ SARIMA прогнозирование с визуализацией
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from statsmodels.graphics.tsaplots import acf, pacf
-from scipy import stats
+import metrics
+from backtest import backtest_orders
+from data import data_version, month_year_table, read_ipc
+from downsample import lttb
+from fitqueue import FitQueue
+from inflation import InflationIndex
+from model_cache import ModelCache
+from modeling import (FAN_LEVELS, PREVIEW_CSS, PREVIEW_NEAREST, PREVIEW_OVERLAP, compact_model, exceed_probability, fan_quantiles, fit_sarima_window,
+                      fit_window_to_store, has_exact_fit, preview_sarima_window, residual_diagnostics, simulate_paths)
+from search import diff_group, groups, rank, search_orders
+import uuid
 import warnings
 warnings.filterwarnings('ignore')
 
+# Минимальная длина окна обучения (месяцев)
+MIN_FIT_MONTHS = 36
+
+# Максимальный горизонт прогноза; веерная диаграмма считается сразу на него
+MAX_FORECAST_STEPS = 36
+# Монте-Карло: число траекторий и сценариев на графике
+FAN_PATHS = 5000
+FAN_SCENARIOS = 5
+
+# Предел записей кэшей, производных от модели (веер, диагностика, бэктест)
+MODEL_CACHE_ENTRIES = 64
+
 # Конфигурация страницы
 st.set_page_config(
     page_title="ИПЦ России | Аналитика",
@@ -181,27 +197,310 @@ st.markdown("""
 
 
 @st.cache_data
-def load_data():
-    """Загрузка данных ИПЦ"""
-    df = pd.read_csv('output/ipc_monthly.csv', parse_dates=['date'], index_col='date')
+def load_data(version):
+    """Загрузка данных ИПЦ (version — токен версии данных для инвалидации кэша)"""
+    metrics.count('cache.load_data.misses')
+    df = read_ipc()
     return df
 
 
+@st.cache_resource
+def model_cache():
+    """Компактные модели всех сессий: LRU с бюджетом памяти IPC_MODEL_CACHE_MB"""
+    return ModelCache()
+
+
+def train_sarima(version, data, window, order, seasonal_order, estimate='mle'):
+    """SARIMA на окне window = (начало, конец) в виде CompactModel
+
+    Ключ кэша — версия данных, окно, порядок и тип оценки; горизонт
+    в ключ не входит, прогноз любой длины — model.forecast(steps).
+    При промахе модель обучается (модели на диске кэшируются по окну
+    и порядку) или, для estimate='preview', оценивается предварительно
+    без оптимизации (параметры пересекающегося окна,
+    ближайшего порядка или CSS; источник — model.start_source).
+    """
+    cache = model_cache()
+    key = (version, window, order, seasonal_order, estimate)
+    model = cache.get(key)
+    if model is None:
+        if estimate == 'mle':
+            model = compact_model(fit_sarima_window(data, *window, order, seasonal_order))
+        else:
+            model = compact_model(*preview_sarima_window(data, *window, order, seasonal_order))
+        model = cache.put(key, model)
+    return model
+
+
+@st.cache_resource
+def fit_queue():
+    """Очередь точных обучений, общая для всех сессий"""
+    return FitQueue()
+
+
+def submit_exact_fit(version, data, window, order, seasonal_order):
+    """Фоновая точная MLE через общую очередь
+
+    Одинаковые модели из разных сессий обучаются один раз; прошлый
+    запрос этой сессии, ещё не начатый, отменяется.
+    """
+    session = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+    key = (version, window, order, seasonal_order)
+    return fit_queue().submit(session, key, fit_window_to_store, data, *window, order, seasonal_order)
+
+
+# Подпись источника параметров предварительной оценки
+PREVIEW_SOURCES = {
+    PREVIEW_OVERLAP: "параметры той же модели на пересекающемся окне",
+    PREVIEW_NEAREST: "параметры ближайшего обученного порядка",
+    PREVIEW_CSS: "CSS-оценки",
+}
+
+
+@st.fragment(run_every=1.0)
+def exact_fit_status(future, source):
+    """Ожидание фоновой MLE; по готовности — перезапуск страницы с точной моделью"""
+    if future.done():
+        st.rerun()
+    st.info(f"⚡ Показана предварительная оценка ({PREVIEW_SOURCES[source]}, без оптимизации). "
+            "Точная оценка (MLE) считается в фоне и заменит прогноз автоматически.")
+
+
+@st.cache_data(show_spinner=False, max_entries=MODEL_CACHE_ENTRIES)
+def simulate_fan(version, _model, window, order, seasonal_order, estimate):
+    """Квантили Монте-Карло траекторий и несколько сценариев на MAX_FORECAST_STEPS месяцев
+
+    Ключ — модель (версия данных, окно, порядок, тип оценки); горизонт в ключ
+    не входит: меньший горизонт — срез той же матрицы.
+    """
+    metrics.count('cache.simulate_fan.misses')
+    with metrics.stage('simulate', repetitions=FAN_PATHS):
+        paths = simulate_paths(_model, MAX_FORECAST_STEPS, FAN_PATHS)
+    return fan_quantiles(paths), paths[:, :FAN_SCENARIOS]
+
+
+@st.cache_data(show_spinner=False, max_entries=MODEL_CACHE_ENTRIES)
+def model_diagnostics(version, _model, window, order, seasonal_order, estimate):
+    """Набор диагностики модели (ACF, PACF, Льюнг–Бокс, Q-Q)
+
+    В памяти — по ключу модели, на диске — вместе с моделью в model_store.
+    """
+    metrics.count('cache.model_diagnostics.misses')
+    return residual_diagnostics(_model, save=estimate == 'mle')
+
+
+@st.cache_data(show_spinner=False, max_entries=MODEL_CACHE_ENTRIES)
+def reduced_series(version, key, _series, max_points):
+    """Ряд для графика, прореженный LTTB до max_points точек
+
+    Ключ — версия данных и key (график и видимый диапазон/модель): при
+    смене периода точки перераспределяются по нему, перезапуск с тем же
+    диапазоном прореживание не повторяет.
+    """
+    metrics.count('cache.reduced_series.misses')
+    with metrics.stage('downsample', points=len(_series)):
+        return lttb(_series, max_points)
+
+
+@st.cache_data(show_spinner=False)
+def run_order_search(data):
+    """Подбор порядка SARIMA по сетке — в пакетном пуле очереди обучений
+
+    Рейтинг хранит AIC и BIC; смена критерия только пересортировывает его.
+    """
+    metrics.count('cache.run_order_search.misses')
+    queue = fit_queue()
+    return search_orders(data, max_workers=queue.batch_workers, executor=queue)
+
+
+@st.cache_data(show_spinner=False, max_entries=MODEL_CACHE_ENTRIES)
+def run_backtest(data, orders, years, horizon):
+    """Бэктест нескольких порядков SARIMA — в пакетном пуле очереди обучений"""
+    metrics.count('cache.run_backtest.misses')
+    return backtest_orders(data, orders, years, horizon, executor=fit_queue())
+
+
+def apply_order(row):
+    """Перенос выбранной модели из рейтинга в параметры сайдбара"""
+    p, d, q = row['order']
+    P, D, Q, s = row['seasonal_order']
+    st.session_state.update(p=p, d=d, q=q, P=P, D=D, Q=Q, s=s)
+
+
+def cached(name, func, *args):
+    """Вызов функции под st.cache_data с учётом обращений и времени
+
+    Время включает хэширование аргументов; промахи считает сама функция.
+    """
+    metrics.count(f'cache.{name}.calls')
+    with metrics.stage(f'cache.{name}'):
+        return func(*args)
+
+
+def debug_session():
+    """Панель отладки и замер графиков — только в сессии, открытой с ?debug=1"""
+    return st.session_state.get('debug', False)
+
+
+def show_figure(name, fig):
+    """Вывод графика; в сессии отладки при включённых метриках — время сериализации и размер"""
+    if metrics.enabled() and debug_session():
+        with metrics.stage(f'render.{name}') as info:
+            info['bytes'] = len(fig.to_json())
+        metrics.observe(f'figure.{name}.bytes', info['bytes'])
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def debug_panel():
+    """Панель отладки в сайдбаре: стадии, кэши и значения процесса"""
+    snap = metrics.snapshot()
+    counters = snap['counters']
+    with st.sidebar.expander("🛠 Метрики (отладка)"):
+        if not metrics.enabled():
+            st.caption("Сбор метрик выключен — запустите дашборд с IPC_METRICS=1")
+            return
+        if snap['stages']:
+            st.markdown("**Стадии, мс**")
+            stages = pd.DataFrame(snap['stages']).T[['count', 'last_ms', 'mean_ms', 'max_ms']]
+            st.dataframe(stages.round(2), use_container_width=True)
+        
+        st.markdown("**Кэши**")
+        rows = []
+        for name in sorted({key.split('.')[1] for key in counters if key.startswith('cache.')}):
+            calls = counters.get(f'cache.{name}.calls', 0)
+            misses = counters.get(f'cache.{name}.misses', 0)
+            rows.append({'Кэш': name, 'Обращений': calls, 'Попаданий': calls - misses, 'Промахов': misses,
+                         'Вытеснений': counters.get(f'cache.{name}.evictions', 0)})
+        hits, misses = counters.get('model_store.hit', 0), counters.get('model_store.miss', 0)
+        rows.append({'Кэш': 'model_store', 'Обращений': hits + misses, 'Попаданий': hits, 'Промахов': misses,
+                     'Вытеснений': 0})
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        usage = model_cache().status()
+        st.caption(f"Кэш моделей: {usage['entries']} шт., {usage['bytes'] / 2**20:.1f} из "
+                   f"{usage['budget_bytes'] / 2**20:.0f} МБ")
+        
+        if snap['values']:
+            st.markdown("**Значения**")
+            st.dataframe(pd.DataFrame(snap['values']).T.round(1), use_container_width=True)
+
+
+@st.cache_resource(max_entries=2)
+def inflation_index(version, _series):
+    """Префиксный индекс накопленной инфляции — один на версию данных"""
+    metrics.count('cache.inflation_index.misses')
+    return InflationIndex(_series)
+
+
 @st.cache_data
-def train_sarima(data, order, seasonal_order, forecast_steps):
-    """Обучение SARIMA модели"""
-    model = SARIMAX(data,
-                    order=order,
-                    seasonal_order=seasonal_order,
-                    enforce_stationarity=False,
-                    enforce_invertibility=False)
-    model_fit = model.fit(disp=False)
+def derived_tables(version, _df, _inflation):
+    """Статистика по годам, матрицы месяц×год (м/м и г/г) и CSV для скачивания
+    
+    Считается один раз на версию данных (_df не хэшируется, ключ — version).
+    """
+    metrics.count('cache.derived_tables.misses')
+    by_year = _df.groupby(_df.index.year)['ipc']
+    yearly_stats = by_year.agg(['mean', 'std', 'min', 'max']).round(2)
+    yearly_stats.columns = ['Среднее', 'Ст. откл.', 'Минимум', 'Максимум']
+    # Инфляция за календарный год (для текущего года — с начала года)
+    bounds = _df.index.to_series().groupby(_df.index.year).agg(['first', 'last'])
+    yearly_stats.insert(0, 'Инфляция за год, %',
+                        [round(_inflation.cumulative(first, last), 2) for first, last in bounds.values])
+    yearly_stats.index.name = 'Год'
+    
+    # Heatmap по годам и месяцам
+    pivot_table = month_year_table(_df)
+    yoy_table = month_year_table(_inflation.yoy_series().to_frame(), 'yoy')
+    
+    csv = _df.to_csv().encode('utf-8')
+    return yearly_stats, pivot_table, yoy_table, csv
+
+
+@st.fragment
+def history_chart(version, df, inflation):
+    """График истории ИПЦ; смена периода перезапускает только этот фрагмент"""
+    import charts
+    
+    # Выбор периода для отображения
+    period = st.radio(
+        "Выберите период:",
+        ["Все данные", "Последние 10 лет", "Последние 5 лет", "Последний год"],
+        horizontal=True
+    )
+    
+    if period == "Последние 10 лет":
+        plot_data = df[df.index >= df.index[-1] - pd.DateOffset(years=10)]
+    elif period == "Последние 5 лет":
+        plot_data = df[df.index >= df.index[-1] - pd.DateOffset(years=5)]
+    elif period == "Последний год":
+        plot_data = df[df.index >= df.index[-1] - pd.DateOffset(years=1)]
+    else:
+        plot_data = df
+    
+    first, last = plot_data.index[0], plot_data.index[-1]
+    st.caption(f"Накопленная инфляция за период: {inflation.cumulative(first, last):,.1f}% "
+               f"({inflation.annualized(first, last):,.1f}% в год)")
     
-    forecast_result = model_fit.get_forecast(steps=forecast_steps)
-    forecast = forecast_result.predicted_mean
-    conf_int = forecast_result.conf_int(alpha=0.05)
+    # Основной график
+    series = cached('reduced_series', reduced_series, version, ('history', first, last),
+                    plot_data['ipc'], charts.MAX_POINTS)
+    fig2 = charts.history_figure(series, period)
     
-    return model_fit, forecast, conf_int
+    show_figure('history', fig2)
+
+
+@st.fragment
+def heatmap_chart(pivot_table, yoy_table):
+    """Тепловая карта: ИПЦ к предыдущему месяцу или инфляция год к году"""
+    import charts
+    
+    measure = st.radio("Показатель", ["К предыдущему месяцу", "Год к году"], horizontal=True,
+                       key="heatmap_measure")
+    if measure == "Год к году":
+        fig3 = charts.heatmap_figure(yoy_table, "Инфляция г/г (%)", 'Инфляция год к году по месяцам и годам')
+    else:
+        fig3 = charts.heatmap_figure(pivot_table)
+    show_figure('heatmap', fig3)
+
+
+@st.fragment
+def data_table(df, csv):
+    """Таблица исходных данных с фильтрами; перезапускается отдельно от main"""
+    # Фильтры
+    col1, col2 = st.columns(2)
+    with col1:
+        year_filter = st.multiselect(
+            "Фильтр по годам",
+            options=sorted(df.index.year.unique()),
+            default=sorted(df.index.year.unique())[-5:]
+        )
+    
+    with col2:
+        search = st.text_input("🔍 Поиск по значению ИПЦ (например: >105)")
+    
+    # Фильтрация
+    display_df = df[df.index.year.isin(year_filter)].copy()
+    display_df = display_df.reset_index()
+    display_df['Год'] = display_df['date'].dt.year
+    display_df['Месяц'] = display_df['date'].dt.strftime('%B')
+    display_df = display_df.rename(columns={'date': 'Дата', 'ipc': 'ИПЦ (%)'})
+    
+    if search:
+        if search.startswith('>'):
+            threshold = float(search[1:])
+            display_df = display_df[display_df['ИПЦ (%)'] > threshold]
+        elif search.startswith('<'):
+            threshold = float(search[1:])
+            display_df = display_df[display_df['ИПЦ (%)'] < threshold]
+    
+    st.dataframe(display_df, use_container_width=True, hide_index=True, height=500)
+    
+    # Скачивание данных
+    st.download_button(
+        label="📥 Скачать данные (CSV)",
+        data=csv,
+        file_name="ipc_russia.csv",
+        mime="text/csv"
+    )
 
 
 def main():
@@ -209,8 +508,17 @@ def main():
     st.markdown('<p class="main-header">📊 Индекс Потребительских Цен России</p>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Анализ и прогнозирование на основе данных Росстата (1991-2025)</p>', unsafe_allow_html=True)
     
+    # Сбор метрик — на весь процесс, только IPC_METRICS=1; ?debug=1 показывает
+    # панель лишь в своей сессии и не включает метрики для остальных
+    if st.query_params.get('debug') == '1':
+        st.session_state['debug'] = True
+    
     # Загрузка данных
-    df = load_data()
+    version = data_version()
+    df = cached('load_data', load_data, version)
+    inflation = cached('inflation_index', inflation_index, version, df['ipc'])
+    yearly_stats, pivot_table, yoy_table, csv_bytes = cached('derived_tables', derived_tables, version, df,
+                                                             inflation)
     
     # Sidebar
     st.sidebar.image("https://rosstat.gov.ru/storage/mediabank/rosstat-logo.png", width=200)
@@ -229,8 +537,43 @@ def main():
     D = col5.number_input("D", 0, 2, 0, key="D")
     Q = col6.number_input("Q", 0, 3, 1, key="Q")
     
-    s = st.sidebar.selectbox("Сезонность (s)", [12, 6, 4, 3], index=0)
-    forecast_steps = st.sidebar.slider("Горизонт прогноза (месяцев)", 3, 36, 12)
+    s = st.sidebar.selectbox("Сезонность (s)", [12, 6, 4, 3], index=0, key="s")
+    forecast_steps = st.sidebar.slider("Горизонт прогноза (месяцев)", 3, MAX_FORECAST_STEPS, 12)
+    
+    # Автоподбор порядка
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🤖 Автоподбор порядка")
+    criterion = st.sidebar.selectbox("Критерий", ["AIC", "BIC"], key="criterion")
+    if st.sidebar.button("Подобрать порядок"):
+        st.session_state['order_search'] = True
+    
+    leaderboard = []
+    if st.session_state.get('order_search'):
+        with st.spinner('Перебор сетки SARIMA...'):
+            searched = cached('run_order_search', run_order_search, df['ipc'])
+        
+        # AIC/BIC сравнимы только при одинаковом дифференцировании —
+        # рейтинг строится внутри выбранной группы (d, D, s)
+        options = groups(searched)
+        current = diff_group((p, d, q), (P, D, Q, s))
+        group = st.sidebar.selectbox(
+            "Дифференцирование", options,
+            index=options.index(current) if current in options else 0,
+            format_func=lambda g: f"d={g[0]}, D={g[1]}" + (f", s={g[2]}" if g[1] else ""),
+            help="AIC и BIC моделей с разными d и D считаются по разным (продифференцированным) "
+                 "рядам и несравнимы, поэтому рейтинг строится внутри одной группы")
+        leaderboard = rank(searched, criterion.lower(), group)
+        
+        top = leaderboard[:10]
+        st.sidebar.dataframe(pd.DataFrame({
+            'Модель': [f"{tuple(r['order'])}x{tuple(r['seasonal_order'])}" for r in top],
+            'AIC': [round(r['aic'], 1) for r in top],
+            'BIC': [round(r['bic'], 1) for r in top],
+        }), hide_index=True, use_container_width=True)
+        
+        choice = st.sidebar.selectbox("Модель из рейтинга", range(len(top)),
+                                      format_func=lambda i: f"#{i + 1} SARIMA{tuple(top[i]['order'])}x{tuple(top[i]['seasonal_order'])}")
+        st.sidebar.button("Применить", on_click=apply_order, args=(top[choice],))
     
     st.sidebar.markdown("---")
     st.sidebar.subheader("📅 Фильтр данных")
@@ -245,6 +588,9 @@ def main():
         max_value=max_date
     )
     
+    fit_on_window = st.sidebar.checkbox("Обучать модель на выбранном периоде", value=False,
+                                        help="По умолчанию модель обучается на всём ряде с 1991 г.")
+    
     # Фильтрация данных
     if len(date_range) == 2:
         mask = (df.index >= pd.Timestamp(date_range[0])) & (df.index <= pd.Timestamp(date_range[1]))
@@ -252,15 +598,49 @@ def main():
     else:
         df_filtered = df
     
+    # Инфляция за выбранный период — O(1) по префиксному индексу
+    if len(df_filtered):
+        first, last = df_filtered.index[0], df_filtered.index[-1]
+        st.sidebar.caption(f"Инфляция {first:%m.%Y}–{last:%m.%Y}: "
+                           f"{inflation.cumulative(first, last):,.1f}% накопленная, "
+                           f"{inflation.annualized(first, last):,.1f}% в год")
+    
+    # Окно обучения
+    window = (str(df.index[0].date()), str(df.index[-1].date()))
+    if fit_on_window and len(df_filtered) < MIN_FIT_MONTHS:
+        st.sidebar.warning(f"Для обучения нужно не меньше {MIN_FIT_MONTHS} месяцев — используется весь ряд")
+    elif fit_on_window:
+        window = (str(df_filtered.index[0].date()), str(df_filtered.index[-1].date()))
+    
     # Обучение модели
     order = (p, d, q)
     seasonal_order = (P, D, Q, s)
     
-    with st.spinner('Обучение модели SARIMA...'):
-        model_fit, forecast, conf_int = train_sarima(df['ipc'], order, seasonal_order, forecast_steps)
-    
-    # Даты прогноза
-    forecast_dates = pd.date_range(start=df.index[-1] + pd.DateOffset(months=1), 
+    # Двухуровневая оценка: если точной MLE ещё нет, сразу показывается
+    # предварительная, а MLE считается в фоновом процессе
+    estimate = 'mle'
+    if has_exact_fit(df['ipc'], *window, order, seasonal_order):
+        model = train_sarima(version, df['ipc'], window, order, seasonal_order)
+    else:
+        future = submit_exact_fit(version, df['ipc'], window, order, seasonal_order)
+        if future.done() and not future.cancelled() and future.exception() is not None:
+            st.warning(f"Фоновая оценка не удалась ({future.exception()}) — обучение в текущей сессии")
+            with st.spinner('Обучение модели SARIMA...'):
+                model = train_sarima(version, df['ipc'], window, order, seasonal_order)
+        else:
+            estimate = 'preview'
+            model = train_sarima(version, df['ipc'], window, order, seasonal_order, estimate)
+            exact_fit_status(future, model.start_source)
+    forecast, conf_int = model.forecast(forecast_steps)
+    estimate_label = 'точная оценка (MLE)' if estimate == 'mle' else 'предварительная оценка'
+    
+    # Даты прогноза (от конца окна обучения). Окно, заканчивающееся раньше
+    # последнего месяца, даёт условный прогноз: история на графике и база
+    # изменения — по концу окна, а не по последним данным
+    window_end = pd.Timestamp(window[1])
+    conditional = window_end < df.index[-1]
+    last_fit_value = df['ipc'][window_end]
+    forecast_dates = pd.date_range(start=window_end + pd.DateOffset(months=1), 
                                     periods=forecast_steps, freq='MS')
     
     # === МЕТРИКИ ===
@@ -276,23 +656,27 @@ def main():
         )
     
     with col2:
+        # Произведение месячных индексов за 12 месяцев, а не их среднее
+        yoy_now = inflation.yoy(df.index[-1])
+        yoy_before = inflation.yoy(df.index[-13])
         st.metric(
-            label="Среднее за год",
-            value=f"{df['ipc'].tail(12).mean():.2f}%",
-            delta=f"{df['ipc'].tail(12).mean() - df['ipc'].tail(24).head(12).mean():.2f}%"
+            label="Инфляция за 12 мес.",
+            value=f"{yoy_now:.2f}%",
+            delta=f"{yoy_now - yoy_before:.2f} п.п."
         )
     
     with col3:
         st.metric(
-            label="Прогноз (след. месяц)",
+            label=f"Прогноз на {forecast_dates[0]:%m.%Y} (усл.)" if conditional else "Прогноз (след. месяц)",
             value=f"{forecast.iloc[0]:.2f}%",
-            delta=f"{forecast.iloc[0] - df['ipc'].iloc[-1]:.2f}%"
+            delta=f"{forecast.iloc[0] - last_fit_value:.2f}%",
+            help=f"Условный прогноз: модель видит данные только по {window_end:%m.%Y}" if conditional else None
         )
     
     with col4:
         st.metric(
-            label="AIC модели",
-            value=f"{model_fit.aic:.0f}"
+            label="AIC модели" if estimate == 'mle' else "AIC (предв.)",
+            value=f"{model.aic:.0f}"
         )
     
     with col5:
@@ -305,62 +689,42 @@ def main():
     st.markdown("---")
     
     # === ВКЛАДКИ ===
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Прогноз", "📈 Исторические данные", "🔬 Диагностика", "📋 Данные"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Прогноз", "📈 Исторические данные", "🔬 Диагностика",
+                                            "📋 Данные", "🧪 Бэктест"])
+    
+    # Тяжёлые модули (plotly, scipy, statsmodels) импортируются при первом
+    # использовании, после отрисовки заголовка и сайдбара
     
     # TAB 1: Прогноз
     with tab1:
-        st.subheader("Прогноз SARIMA")
-        
-        # График прогноза
-        fig = go.Figure()
-        
-        # Последние 3 года данных
-        recent_data = df[df.index >= df.index[-1] - pd.DateOffset(years=3)]
-        
-        # Исторические данные
-        fig.add_trace(go.Scatter(
-            x=recent_data.index,
-            y=recent_data['ipc'],
-            mode='lines',
-            name='Фактические данные',
-            line=dict(color='#2E86AB', width=2)
-        ))
-        
-        # Прогноз
-        fig.add_trace(go.Scatter(
-            x=forecast_dates,
-            y=forecast,
-            mode='lines+markers',
-            name='Прогноз',
-            line=dict(color='#A23B72', width=2, dash='dash'),
-            marker=dict(size=8)
-        ))
+        import charts
         
-        # Доверительный интервал
-        fig.add_trace(go.Scatter(
-            x=list(forecast_dates) + list(forecast_dates[::-1]),
-            y=list(conf_int.iloc[:, 1]) + list(conf_int.iloc[:, 0][::-1]),
-            fill='toself',
-            fillcolor='rgba(162, 59, 114, 0.2)',
-            line=dict(color='rgba(255,255,255,0)'),
-            name='95% доверительный интервал',
-            showlegend=True
-        ))
-        
-        # Линия 100%
-        fig.add_hline(y=100, line_dash="dash", line_color="gray", opacity=0.5)
-        
-        fig.update_layout(
-            title=f'Прогноз ИПЦ на {forecast_steps} месяцев | SARIMA{order}x{seasonal_order}',
-            xaxis_title='Дата',
-            yaxis_title='ИПЦ (% к предыдущему месяцу)',
-            hovermode='x unified',
-            template='plotly_white',
-            height=500,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
+        st.subheader("Прогноз SARIMA")
         
-        st.plotly_chart(fig, use_container_width=True)
+        fan_mode = st.toggle("Веерная диаграмма (Монте-Карло)",
+                             help=f"{FAN_PATHS} траекторий, смоделированных из обученной модели")
+        
+        # График прогноза: последние 3 года окна обучения + прогноз
+        history = df[:window_end]
+        recent_data = history[history.index >= window_end - pd.DateOffset(years=3)]
+        recent_data = cached('reduced_series', reduced_series, version,
+                             ('recent', recent_data.index[0], recent_data.index[-1]),
+                             recent_data['ipc'], charts.MAX_POINTS).to_frame()
+        title = f'Прогноз ИПЦ на {forecast_steps} месяцев | SARIMA{order}x{seasonal_order} | {estimate_label}'
+        if conditional:
+            title += f' | условный, от {window_end:%m.%Y}'
+            st.caption(f"Окно обучения заканчивается в {window_end:%m.%Y}: прогноз условный — "
+                       f"фактические данные после этой даты модели неизвестны и на графике не показаны.")
+        if fan_mode:
+            with st.spinner('Моделирование траекторий...'):
+                quantiles, scenarios = cached('simulate_fan', simulate_fan, version, model, window,
+                                              order, seasonal_order, estimate)
+            quantiles, scenarios = quantiles[:forecast_steps], scenarios[:forecast_steps]
+            fig = charts.fan_figure(recent_data, forecast_dates, quantiles, FAN_LEVELS, scenarios, title)
+            show_figure('fan', fig)
+        else:
+            fig = charts.forecast_figure(recent_data, forecast_dates, forecast, conf_int, title)
+            show_figure('forecast', fig)
         
         # Таблица прогноза
         st.subheader("📋 Детальный прогноз")
@@ -374,179 +738,132 @@ def main():
                               for v in forecast.values]
         })
         
+        if fan_mode:
+            threshold = st.number_input("Порог ИПЦ для вероятности превышения", value=101.0, step=0.1,
+                                        format="%.1f")
+            forecast_df.insert(4, f'P(ИПЦ > {threshold:.1f}), %',
+                               (exceed_probability(quantiles, threshold) * 100).round(0))
+        
         st.dataframe(forecast_df, use_container_width=True, hide_index=True)
     
     # TAB 2: Исторические данные
     with tab2:
         st.subheader("Исторические данные ИПЦ")
         
-        # Выбор периода для отображения
-        period = st.radio(
-            "Выберите период:",
-            ["Все данные", "Последние 10 лет", "Последние 5 лет", "Последний год"],
-            horizontal=True
-        )
-        
-        if period == "Последние 10 лет":
-            plot_data = df[df.index >= df.index[-1] - pd.DateOffset(years=10)]
-        elif period == "Последние 5 лет":
-            plot_data = df[df.index >= df.index[-1] - pd.DateOffset(years=5)]
-        elif period == "Последний год":
-            plot_data = df[df.index >= df.index[-1] - pd.DateOffset(years=1)]
-        else:
-            plot_data = df
-        
-        # Основной график
-        fig2 = px.line(plot_data.reset_index(), x='date', y='ipc',
-                       title=f'Динамика ИПЦ | {period}',
-                       labels={'date': 'Дата', 'ipc': 'ИПЦ (%)'},
-                       template='plotly_white')
-        
-        fig2.update_traces(line=dict(color='#2E86AB', width=1.5))
-        fig2.add_hline(y=100, line_dash="dash", line_color="gray")
-        fig2.update_layout(height=400)
-        
-        st.plotly_chart(fig2, use_container_width=True)
+        # График с выбором периода — отдельный фрагмент
+        history_chart(version, df, inflation)
         
         # Статистика по годам
         st.subheader("📊 Статистика по годам")
+        st.dataframe(yearly_stats, use_container_width=True)
         
-        yearly_stats = df.groupby(df.index.year)['ipc'].agg(['mean', 'std', 'min', 'max']).round(2)
-        yearly_stats.columns = ['Среднее', 'Ст. откл.', 'Минимум', 'Максимум']
-        yearly_stats.index.name = 'Год'
-        
-        # Heatmap по годам и месяцам
-        pivot_data = df.copy()
-        pivot_data['year'] = pivot_data.index.year
-        pivot_data['month'] = pivot_data.index.month
-        pivot_table = pivot_data.pivot_table(values='ipc', index='year', columns='month', aggfunc='mean')
-        
-        fig3 = px.imshow(pivot_table,
-                         labels=dict(x="Месяц", y="Год", color="ИПЦ (%)"),
-                         x=['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 
-                            'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек'],
-                         aspect="auto",
-                         color_continuous_scale='RdYlGn_r',
-                         title='Тепловая карта ИПЦ по месяцам и годам')
-        
-        fig3.update_layout(height=600)
-        st.plotly_chart(fig3, use_container_width=True)
+        # Heatmap по годам и месяцам — отдельный фрагмент
+        heatmap_chart(pivot_table, yoy_table)
     
     # TAB 3: Диагностика
     with tab3:
         st.subheader("Диагностика модели SARIMA")
         
-        residuals = model_fit.resid
+        # Тяжёлые расчёты — один раз на модель; вкладка только рисует
+        diag = cached('model_diagnostics', model_diagnostics, version, model, window, order, seasonal_order,
+                      estimate)
+        if estimate == 'preview':
+            st.caption("⚡ Диагностика предварительной оценки — обновится после точной MLE")
+        residuals = model.resid
+        model_key = (window, order, seasonal_order, estimate)
         
         col1, col2 = st.columns(2)
         
         with col1:
             # ACF
-            acf_values = acf(residuals, nlags=40)
-            fig_acf = go.Figure()
-            fig_acf.add_trace(go.Bar(x=list(range(len(acf_values))), y=acf_values, 
-                                     marker_color='#2E86AB'))
-            fig_acf.add_hline(y=1.96/np.sqrt(len(residuals)), line_dash="dash", line_color="red")
-            fig_acf.add_hline(y=-1.96/np.sqrt(len(residuals)), line_dash="dash", line_color="red")
-            fig_acf.update_layout(title='ACF остатков', xaxis_title='Лаг', yaxis_title='ACF',
-                                  template='plotly_white', height=350)
-            st.plotly_chart(fig_acf, use_container_width=True)
+            fig_acf = charts.correlogram_figure(diag['acf'], len(residuals), 'ACF остатков', 'ACF', '#2E86AB')
+            show_figure('acf', fig_acf)
         
         with col2:
             # PACF
-            pacf_values = pacf(residuals, nlags=40)
-            fig_pacf = go.Figure()
-            fig_pacf.add_trace(go.Bar(x=list(range(len(pacf_values))), y=pacf_values,
-                                      marker_color='#A23B72'))
-            fig_pacf.add_hline(y=1.96/np.sqrt(len(residuals)), line_dash="dash", line_color="red")
-            fig_pacf.add_hline(y=-1.96/np.sqrt(len(residuals)), line_dash="dash", line_color="red")
-            fig_pacf.update_layout(title='PACF остатков', xaxis_title='Лаг', yaxis_title='PACF',
-                                   template='plotly_white', height=350)
-            st.plotly_chart(fig_pacf, use_container_width=True)
+            fig_pacf = charts.correlogram_figure(diag['pacf'], len(residuals), 'PACF остатков', 'PACF', '#A23B72')
+            show_figure('pacf', fig_pacf)
         
         col3, col4 = st.columns(2)
         
         with col3:
             # Q-Q Plot
-            qq_data = stats.probplot(residuals, dist="norm")
-            fig_qq = go.Figure()
-            fig_qq.add_trace(go.Scatter(x=qq_data[0][0], y=qq_data[0][1], mode='markers',
-                                        marker=dict(color='#2E86AB', size=5), name='Остатки'))
-            fig_qq.add_trace(go.Scatter(x=qq_data[0][0], y=qq_data[1][0] + qq_data[1][1]*qq_data[0][0],
-                                        mode='lines', line=dict(color='red', dash='dash'), name='Теор. норм.'))
-            fig_qq.update_layout(title='Q-Q Plot', xaxis_title='Теоретические квантили',
-                                 yaxis_title='Выборочные квантили', template='plotly_white', height=350)
-            st.plotly_chart(fig_qq, use_container_width=True)
+            qq = diag['qq']
+            qq_points = cached('reduced_series', reduced_series, version, ('qq',) + model_key,
+                               pd.Series(qq['osr'], index=qq['osm']), charts.MAX_POINTS)
+            fig_qq = charts.qq_figure(qq_points.index.to_numpy(), qq_points.to_numpy(),
+                                      qq['slope'], qq['intercept'])
+            show_figure('qq', fig_qq)
         
         with col4:
             # Распределение остатков
-            fig_hist = px.histogram(residuals, nbins=40, title='Распределение остатков',
-                                    labels={'value': 'Остатки', 'count': 'Частота'},
-                                    template='plotly_white')
-            fig_hist.update_traces(marker_color='#F18F01')
-            fig_hist.update_layout(height=350, showlegend=False)
-            st.plotly_chart(fig_hist, use_container_width=True)
+            fig_hist = charts.residual_hist_figure(residuals)
+            show_figure('hist', fig_hist)
         
         # Остатки во времени
-        fig_resid = go.Figure()
-        fig_resid.add_trace(go.Scatter(x=df.index, y=residuals, mode='lines',
-                                       line=dict(color='#2E86AB', width=1)))
-        fig_resid.add_hline(y=0, line_dash="dash", line_color="red")
-        fig_resid.update_layout(title='Остатки модели во времени',
-                                xaxis_title='Дата', yaxis_title='Остатки',
-                                template='plotly_white', height=300)
-        st.plotly_chart(fig_resid, use_container_width=True)
+        fig_resid = charts.residuals_figure(cached('reduced_series', reduced_series, version,
+                                                   ('resid',) + model_key, residuals, charts.MAX_POINTS))
+        show_figure('resid', fig_resid)
+        
+        # Тест Льюнга–Бокса
+        st.subheader("🧾 Тест Льюнга–Бокса")
+        lb = pd.DataFrame(diag['ljung_box']).set_index('lags')
+        lb = lb.loc[[lag for lag in (6, 12, 18, 24, 36) if lag in lb.index]]
+        lb.index.name = 'Лаг'
+        lb.columns = ['Q-статистика', 'p-value']
+        st.dataframe(lb.round(4), use_container_width=True)
+        st.caption("p-value < 0.05 — в остатках осталась автокорреляция до этого лага")
         
         # Статистика модели
         st.subheader("📊 Статистика модели")
         
         col1, col2, col3, col4 = st.columns(4)
-        col1.metric("AIC", f"{model_fit.aic:.2f}")
-        col2.metric("BIC", f"{model_fit.bic:.2f}")
-        col3.metric("Среднее остатков", f"{residuals.mean():.4f}")
-        col4.metric("Ст. откл. остатков", f"{residuals.std():.4f}")
+        col1.metric("AIC", f"{diag['aic']:.2f}")
+        col2.metric("BIC", f"{diag['bic']:.2f}")
+        col3.metric("Среднее остатков", f"{diag['resid_mean']:.4f}")
+        col4.metric("Ст. откл. остатков", f"{diag['resid_std']:.4f}")
     
     # TAB 4: Данные
     with tab4:
         st.subheader("📋 Исходные данные")
         
-        # Фильтры
-        col1, col2 = st.columns(2)
-        with col1:
-            year_filter = st.multiselect(
-                "Фильтр по годам",
-                options=sorted(df.index.year.unique()),
-                default=sorted(df.index.year.unique())[-5:]
-            )
-        
-        with col2:
-            search = st.text_input("🔍 Поиск по значению ИПЦ (например: >105)")
-        
-        # Фильтрация
-        display_df = df[df.index.year.isin(year_filter)].copy()
-        display_df = display_df.reset_index()
-        display_df['Год'] = display_df['date'].dt.year
-        display_df['Месяц'] = display_df['date'].dt.strftime('%B')
-        display_df = display_df.rename(columns={'date': 'Дата', 'ipc': 'ИПЦ (%)'})
-        
-        if search:
-            if search.startswith('>'):
-                threshold = float(search[1:])
-                display_df = display_df[display_df['ИПЦ (%)'] > threshold]
-            elif search.startswith('<'):
-                threshold = float(search[1:])
-                display_df = display_df[display_df['ИПЦ (%)'] < threshold]
-        
-        st.dataframe(display_df, use_container_width=True, hide_index=True, height=500)
+        # Фильтры и таблица — отдельный фрагмент
+        data_table(df, csv_bytes)
+    
+    # TAB 5: Бэктест
+    with tab5:
+        st.subheader("Бэктест со скользящим началом прогноза")
+        st.caption("Модель обучается один раз, затем начало прогноза сдвигается помесячно "
+                   "фильтрацией новых наблюдений без переобучения")
         
-        # Скачивание данных
-        csv = df.to_csv()
-        st.download_button(
-            label="📥 Скачать данные (CSV)",
-            data=csv,
-            file_name="ipc_russia.csv",
-            mime="text/csv"
-        )
+        col1, col2 = st.columns(2)
+        bt_years = col1.slider("Тестовый период (лет)", 1, 10, 5)
+        bt_horizon = col2.slider("Горизонт (месяцев)", 1, 24, 12)
+        
+        # Текущая модель + лидеры автоподбора
+        bt_orders = [(order, seasonal_order)]
+        for row in leaderboard[:3]:
+            candidate = (tuple(row['order']), tuple(row['seasonal_order']))
+            if candidate not in bt_orders:
+                bt_orders.append(candidate)
+        
+        if st.button("Запустить бэктест"):
+            st.session_state['backtest'] = True
+        
+        if st.session_state.get('backtest'):
+            with st.spinner('Бэктест моделей...'):
+                bt_results = cached('run_backtest', run_backtest, df['ipc'], tuple(bt_orders), bt_years, bt_horizon)
+            
+            fig_bt = charts.backtest_figure(bt_results)
+            show_figure('backtest', fig_bt)
+            
+            for (bt_order, bt_seasonal), bt_metrics in bt_results.items():
+                st.markdown(f"**SARIMA{bt_order}x{bt_seasonal}**")
+                st.dataframe(bt_metrics.rename(columns={'coverage': 'Покрытие 95%', 'n': 'Прогнозов'}).round(3),
+                             use_container_width=True)
+    
+    if debug_session():
+        debug_panel()
     
     # Footer
     st.markdown("---")
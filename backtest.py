@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Бэктест SARIMA со скользящим началом прогноза (rolling origin)
+
+Модель обучается один раз на данных до первой точки прогноза.
+Дальше начало прогноза сдвигается на месяц вперёд через
+results.extend(): новое наблюдение проходит через фильтр Калмана
+от последнего состояния, без повторного вызова fit().
+Разные порядки модели считаются параллельно в пуле процессов.
+"""
+
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data import IPC_CSV, read_ipc
+from modeling import fit_sarima
+
+
+def rolling_backtest(data, order, seasonal_order, years=5, horizon=12, alpha=0.05):
+    """Метрики качества прогноза по горизонтам для одной модели
+
+    Возвращает DataFrame с индексом horizon и колонками
+    MAE, RMSE, coverage (доля факта внутри интервала), n.
+    """
+    n_test = years * 12
+    train, test = data.iloc[:-n_test], data.iloc[-n_test:]
+    results = fit_sarima(train, order, seasonal_order)
+
+    errors = [[] for _ in range(horizon)]
+    covered = [[] for _ in range(horizon)]
+    for t in range(n_test):
+        steps = min(horizon, n_test - t)
+        forecast = results.get_forecast(steps=steps)
+        mean = np.asarray(forecast.predicted_mean)
+        conf_int = np.asarray(forecast.conf_int(alpha=alpha))
+        actual = test.values[t:t + steps]
+        for h in range(steps):
+            errors[h].append(actual[h] - mean[h])
+            covered[h].append(conf_int[h, 0] <= actual[h] <= conf_int[h, 1])
+        # Сдвиг начала прогноза: фильтрация нового наблюдения без переобучения
+        results = results.extend(test.iloc[t:t + 1])
+
+    rows = []
+    for h in range(horizon):
+        err = np.asarray(errors[h])
+        rows.append({
+            'horizon': h + 1,
+            'MAE': np.abs(err).mean(),
+            'RMSE': np.sqrt((err ** 2).mean()),
+            'coverage': np.mean(covered[h]),
+            'n': len(err),
+        })
+    return pd.DataFrame(rows).set_index('horizon')
+
+
+def _run(args):
+    data, order, seasonal_order, years, horizon = args
+    return rolling_backtest(data, order, seasonal_order, years, horizon)
+
+
+def backtest_orders(data, orders, years=5, horizon=12, max_workers=None, executor=None):
+    """Параллельный бэктест нескольких порядков
+
+    orders — список (order, seasonal_order).
+    executor — объект с методом map (общая очередь обучений дашборда);
+    без него создаётся свой пул на max_workers процессов.
+    Возвращает словарь {(order, seasonal_order): DataFrame метрик}.
+    """
+    orders = [(tuple(o), tuple(so)) for o, so in orders]
+    tasks = [(data, o, so, years, horizon) for o, so in orders]
+    if executor is not None:
+        return dict(zip(orders, executor.map(_run, tasks)))
+    if len(tasks) == 1:
+        return {orders[0]: rolling_backtest(data, *orders[0], years, horizon)}
+
+    workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return dict(zip(orders, pool.map(_run, tasks)))
+
+
+def _parse_order(text):
+    """'1,0,1x1,0,1,12' -> ((1,0,1), (1,0,1,12))"""
+    left, right = text.split('x')
+    return tuple(int(v) for v in left.split(',')), tuple(int(v) for v in right.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бэктест SARIMA со скользящим началом прогноза')
+    parser.add_argument('orders', nargs='*', default=['1,0,1x1,0,1,12'],
+                        help='порядки в формате p,d,qxP,D,Q,s')
+    parser.add_argument('--csv', default=IPC_CSV)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--horizon', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    df = read_ipc(args.csv)
+    orders = [_parse_order(o) for o in args.orders]
+    for (order, seasonal_order), metrics in backtest_orders(
+            df['ipc'], orders, args.years, args.horizon, args.workers).items():
+        print(f'SARIMA{order}x{seasonal_order}')
+        print(metrics.round(3).to_string())
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки горячих путей дашборда
+
+Замеряются: загрузка данных (CSV и колоночный кэш), обучение SARIMA
+(с нуля и восстановление из model_store) и прогноз для набора порядков
+и горизонтов, Монте-Карло траектории веерной диаграммы, диагностика остатков (ACF/PACF/probplot) и построение
+каждого Plotly графика из main() вместе с сериализацией в JSON
+(длинные ряды прорежены LTTB, как в дашборде).
+Данные — output/ipc_monthly.csv и синтетические длинные ряды.
+
+Результаты сохраняются в JSON (benchmarks/baseline.json); при повторном
+запуске медианы сравниваются с базой, код возврата 1 — если хотя бы
+один бенчмарк медленнее базы больше чем на порог. Пороги по отдельным
+бенчмаркам задаются в поле "thresholds" файла базы.
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+import model_store
+from data import IPC_CSV, month_year_table, read_ipc, read_store
+from downsample import lttb
+from inflation import InflationIndex
+from modeling import FAN_LEVELS, compact_model, fan_quantiles, fit_sarima_window, forecast_sarima, simulate_paths
+
+BASELINE = Path('benchmarks/baseline.json')
+DEFAULT_THRESHOLD = 0.25
+
+ORDERS = [
+    ((1, 0, 1), (1, 0, 1, 12)),   # модель дашборда по умолчанию
+    ((0, 1, 1), (0, 1, 1, 12)),   # airline
+    ((2, 0, 0), (1, 0, 0, 12)),
+]
+HORIZONS = [12, 36]
+FIGURES = ['forecast', 'fan', 'history', 'heatmap', 'acf', 'pacf', 'qq', 'hist', 'resid']
+
+
+@dataclass
+class Case:
+    """Бенчмарк: run(setup()) замеряется repeat раз, setup — вне замера"""
+    name: str
+    run: Callable
+    setup: Optional[Callable] = None
+    repeat: Optional[int] = None
+    threshold: Optional[float] = None
+
+
+def synthetic_series(n, seed=0):
+    """Ряд, похожий на ИПЦ: сезонность + AR(1) шум вокруг 100.5"""
+    rng = np.random.default_rng(seed)
+    noise = np.zeros(n)
+    shocks = rng.normal(0, 0.3, n)
+    for t in range(1, n):
+        noise[t] = 0.6 * noise[t - 1] + shocks[t]
+    values = 100.5 + 0.3 * np.sin(2 * np.pi * np.arange(n) / 12) + noise
+    index = pd.date_range('1800-01-01', periods=n, freq='MS', name='date')
+    return pd.DataFrame({'ipc': values}, index=index)
+
+
+class Workspace:
+    """Данные и временные каталоги бенчмарков (моделей, CSV, кэша)"""
+
+    def __init__(self, sizes):
+        self.tmp = tempfile.TemporaryDirectory(prefix='ipc-bench-')
+        self.root = Path(self.tmp.name)
+        self.datasets = {'ipc': pd.read_csv(IPC_CSV, parse_dates=['date'], index_col='date')}
+        for n in sizes:
+            self.datasets[f'synth{n}'] = synthetic_series(n)
+        self._runs = 0
+
+    def csv_path(self, name):
+        path = self.root / 'csv' / f'{name}.csv'
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.datasets[name].to_csv(path, date_format='%Y-%m-%d')
+        return path
+
+    def store_dir(self, name):
+        """Колоночный кэш в формате ingest.py"""
+        store = self.root / 'store' / name
+        if not store.exists():
+            df = self.datasets[name]
+            store.mkdir(parents=True)
+            (store / 'ipc.f64').write_bytes(df['ipc'].values.astype('<f8').tobytes())
+            meta = {'start': str(df.index[0].date()), 'n': len(df), 'columns': ['ipc'],
+                    'revision': 1, 'sources': []}
+            (store / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+        return store
+
+    def shared_models(self):
+        model_store.MODEL_DIR = self.root / 'models'
+
+    def empty_models(self):
+        self._runs += 1
+        model_store.MODEL_DIR = self.root / f'models-cold-{self._runs}'
+
+    @lru_cache(maxsize=None)
+    def fitted(self, name, order, seasonal_order):
+        self.shared_models()
+        series = self.datasets[name]['ipc']
+        return fit_sarima_window(series, series.index[0], series.index[-1], order, seasonal_order)
+
+    @lru_cache(maxsize=None)
+    def compact(self, name, order, seasonal_order):
+        return compact_model(self.fitted(name, order, seasonal_order))
+
+
+def _label(order, seasonal_order):
+    return model_store.order_key(order, seasonal_order)
+
+
+def collect(ws):
+    """Все бенчмарки; тяжёлая подготовка выполняется лениво в setup"""
+    cases = []
+    default = ORDERS[0]
+
+    for name in ws.datasets:
+        cases.append(Case(f'load.csv.{name}', lambda path: read_ipc(path),
+                          setup=lambda name=name: ws.csv_path(name)))
+        cases.append(Case(f'load.store.{name}', lambda store: read_store(store),
+                          setup=lambda name=name: ws.store_dir(name)))
+        cases.append(Case(f'inflation.index.{name}', InflationIndex,
+                          setup=lambda name=name: ws.datasets[name]['ipc']))
+        cases.append(Case(f'inflation.range.{name}', _inflation_range,
+                          setup=lambda name=name: InflationIndex(ws.datasets[name]['ipc'])))
+        cases.append(Case(f'downsample.{name}', lambda series: lttb(series, _max_points()),
+                          setup=lambda name=name: ws.datasets[name]['ipc']))
+
+    # Обучение: все порядки на реальных данных, порядок по умолчанию — на синтетике
+    fits = [('ipc', order) for order in ORDERS]
+    fits += [(name, default) for name in ws.datasets if name != 'ipc']
+    for name, (order, seasonal_order) in fits:
+        series = ws.datasets[name]['ipc']
+        window = (series.index[0], series.index[-1])
+        label = _label(order, seasonal_order)
+        fit = (lambda _, series=series, window=window, order=order, seasonal_order=seasonal_order:
+               fit_sarima_window(series, *window, order, seasonal_order))
+        cases.append(Case(f'fit.cold.{name}.{label}', fit, setup=ws.empty_models,
+                          repeat=3, threshold=0.5))
+
+        def warm(name=name, order=order, seasonal_order=seasonal_order):
+            ws.fitted(name, order, seasonal_order)
+            ws.shared_models()
+        cases.append(Case(f'fit.cached.{name}.{label}', fit, setup=warm))
+
+        for steps in HORIZONS:
+            cases.append(Case(f'forecast.{name}.{label}.h{steps}',
+                              lambda model_fit, steps=steps: forecast_sarima(model_fit, steps),
+                              setup=lambda name=name, order=order, seasonal_order=seasonal_order:
+                              ws.fitted(name, order, seasonal_order)))
+            cases.append(Case(f'forecast.compact.{name}.{label}.h{steps}',
+                              lambda model, steps=steps: model.forecast(steps),
+                              setup=lambda name=name, order=order, seasonal_order=seasonal_order:
+                              ws.compact(name, order, seasonal_order)))
+
+    # Диагностика остатков и графики — на модели по умолчанию
+    for name in ws.datasets:
+        def resid(name=name):
+            return ws.fitted(name, *default).resid
+
+        cases.append(Case(f'compact.{name}', compact_model,
+                          setup=lambda name=name: ws.fitted(name, *default)))
+        cases.append(Case(f'simulate.{name}.h36', _simulate,
+                          setup=lambda name=name: ws.compact(name, *default)))
+        cases.append(Case(f'diag.acf.{name}', _acf, setup=resid))
+        cases.append(Case(f'diag.pacf.{name}', _pacf, setup=resid))
+        cases.append(Case(f'diag.probplot.{name}', _probplot, setup=resid))
+        for figure in FIGURES:
+            cases.append(Case(f'render.{figure}.{name}', _render,
+                              setup=lambda name=name, figure=figure: _figure_args(ws, name, figure)))
+
+    cases.append(Case('render.backtest.ipc', _render,
+                      setup=lambda: ('backtest_figure', (_backtest_results(ws),)), repeat=3))
+    return cases
+
+
+def _inflation_range(index):
+    """Запросы UI: накопленная и среднегодовая за период, г/г на конец"""
+    start, end = index.dates[index.n // 3], index.dates[-1]
+    return index.cumulative(start, end), index.annualized(start, end), index.yoy(end)
+
+
+def _simulate(model):
+    return fan_quantiles(simulate_paths(model, 36, 5000))
+
+
+def _acf(residuals):
+    from statsmodels.tsa.stattools import acf
+    return acf(residuals, nlags=40)
+
+
+def _pacf(residuals):
+    from statsmodels.tsa.stattools import pacf
+    return pacf(residuals, nlags=40)
+
+
+def _probplot(residuals):
+    from scipy import stats
+    return stats.probplot(residuals, dist="norm")
+
+
+def _max_points():
+    import charts
+    return charts.MAX_POINTS
+
+
+def _render(args):
+    """Построение фигуры и её сериализация (как при отправке в браузер)"""
+    import charts
+    builder, builder_args = args
+    return getattr(charts, builder)(*builder_args).to_json()
+
+
+def _figure_args(ws, name, figure):
+    """Аргументы построителя из charts.py — те же, что готовит main()"""
+    df = ws.datasets[name]
+    model_fit = ws.fitted(name, *ORDERS[0])
+    residuals = model_fit.resid
+    recent = lttb(df[df.index >= df.index[-1] - pd.DateOffset(years=3)]['ipc'], _max_points()).to_frame()
+    if figure == 'forecast':
+        steps = 12
+        forecast, conf_int = forecast_sarima(model_fit, steps)
+        dates = pd.date_range(df.index[-1] + pd.DateOffset(months=1), periods=steps, freq='MS')
+        return 'forecast_figure', (recent, dates, forecast, conf_int, 'Прогноз ИПЦ')
+    if figure == 'fan':
+        steps = 12
+        paths = simulate_paths(ws.compact(name, *ORDERS[0]), steps, 5000)
+        dates = pd.date_range(df.index[-1] + pd.DateOffset(months=1), periods=steps, freq='MS')
+        return 'fan_figure', (recent, dates, fan_quantiles(paths), FAN_LEVELS, paths[:, :5], 'Прогноз ИПЦ')
+    if figure == 'history':
+        return 'history_figure', (lttb(df['ipc'], _max_points()), 'Все данные')
+    if figure == 'heatmap':
+        return 'heatmap_figure', (month_year_table(df),)
+    if figure in ('acf', 'pacf'):
+        values = _acf(residuals) if figure == 'acf' else _pacf(residuals)
+        return 'correlogram_figure', (values, len(residuals), figure.upper(), figure.upper(), '#2E86AB')
+    if figure == 'qq':
+        (osm, osr), (slope, intercept, _) = _probplot(residuals)
+        points = lttb(pd.Series(osr, index=osm), _max_points())
+        return 'qq_figure', (points.index.to_numpy(), points.to_numpy(), slope, intercept)
+    if figure == 'hist':
+        return 'residual_hist_figure', (residuals,)
+    return 'residuals_figure', (lttb(residuals, _max_points()),)
+
+
+@lru_cache(maxsize=None)
+def _backtest_results(ws):
+    from backtest import rolling_backtest
+    ws.shared_models()
+    series = ws.datasets['ipc']['ipc']
+    return {order: rolling_backtest(series, *order, years=5, horizon=12) for order in ORDERS[:2]}
+
+
+def measure(case, repeat, min_sample=0.05):
+    """Прогрев + repeat замеров; время одного вызова в мс
+
+    Быстрые бенчмарки выполняются по number раз на замер, чтобы
+    замер длился не меньше min_sample секунд и не тонул в шуме таймера.
+    """
+    repeat = min(repeat, case.repeat or repeat)
+    args = case.setup() if case.setup else None
+    started = time.perf_counter()
+    case.run(args)
+    number = max(1, int(min_sample / max(time.perf_counter() - started, 1e-6)))
+    times = []
+    # Как в timeit: сборщик мусора отключён на время замера
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            args = case.setup() if case.setup else None
+            started = time.perf_counter()
+            for _ in range(number):
+                case.run(args)
+            times.append((time.perf_counter() - started) * 1000 / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return times, number
+
+
+def environment():
+    import plotly
+    import statsmodels
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'statsmodels': statsmodels.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def compare(results, baseline, default_threshold):
+    """Сравнение медиан с базой: [(name, base_ms, ms, ratio, threshold, regression)]"""
+    overrides = baseline.get('thresholds', {})
+    rows = []
+    for name, result in results.items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            continue
+        threshold = overrides.get(name, result['threshold'] or default_threshold)
+        ratio = result['median_ms'] / base['median_ms']
+        rows.append((name, base['median_ms'], result['median_ms'], ratio, threshold, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки горячих путей дашборда')
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help='шаблон имён бенчмарков (fnmatch), можно несколько')
+    parser.add_argument('--list', action='store_true', help='только список бенчмарков')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 3000],
+                        help='длины синтетических рядов, мес.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты как базу')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='допустимое замедление медианы (0.25 = 25%%)')
+    parser.add_argument('--json', type=Path, help='сохранить результаты в файл')
+    args = parser.parse_args()
+
+    ws = Workspace(args.sizes)
+    cases = [c for c in collect(ws)
+             if not args.patterns or any(fnmatch.fnmatch(c.name, p) for p in args.patterns)]
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return
+
+    # statsmodels при импорте включает показ своих предупреждений
+    import statsmodels.tools.sm_exceptions  # noqa: F401
+    warnings.simplefilter('ignore')
+
+    results = {}
+    for case in cases:
+        times, number = measure(case, args.repeat)
+        results[case.name] = {
+            'median_ms': round(statistics.median(times), 3),
+            'min_ms': round(min(times), 3),
+            'repeat': len(times),
+            'number': number,
+            'threshold': case.threshold,
+        }
+        print(f"{results[case.name]['median_ms']:10.2f} мс  {case.name}", flush=True)
+    report = {'meta': environment(), 'benchmarks': results}
+
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    baseline = None
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+
+    if args.save_baseline:
+        # Пороги, заданные вручную, и бенчмарки вне фильтра -k сохраняются
+        if baseline is not None:
+            report['thresholds'] = baseline.get('thresholds', {})
+            report['benchmarks'] = {**baseline['benchmarks'], **results}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f'База сохранена: {args.baseline}')
+        return
+
+    if baseline is None:
+        print(f'Базы нет ({args.baseline}) — сравнение пропущено')
+        return
+
+    regressions = 0
+    print(f"\nСравнение с базой от {baseline['meta']['created']}:")
+    for name, base_ms, ms, ratio, threshold, regression in compare(results, baseline, args.threshold):
+        regressions += regression
+        mark = 'РЕГРЕССИЯ' if regression else 'ok'
+        print(f'  {ratio:6.2f}x  (порог {1 + threshold:.2f}x)  {base_ms:9.2f} -> {ms:9.2f} мс  {name}  {mark}')
+    if baseline['meta'].get('platform') != report['meta']['platform']:
+        print('Внимание: база снята на другой платформе')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
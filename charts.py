@@ -0,0 +1,223 @@
+"""
+Построение Plotly графиков дашборда
+
+Функции только строят фигуры из готовых данных и ничего не выводят —
+их можно вызывать вне Streamlit (бенчмарки, экспорт).
+
+Длинные ряды передаются уже прореженными до MAX_POINTS точек
+(downsample.lttb, в дашборде — с кэшем по версии данных); линии
+длиннее WEBGL_POINTS рисуются WebGL-трассами (Scattergl).
+"""
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from data import MONTHS_RU
+
+# Точек на линию после прореживания и порог перехода на WebGL (как render_mode='auto' в plotly.express)
+MAX_POINTS = 2000
+WEBGL_POINTS = 1000
+HIST_BINS = 40
+
+
+def _scatter(x, y, **kwargs):
+    """Scatter, для длинных рядов — Scattergl"""
+    trace = go.Scattergl if len(x) > WEBGL_POINTS else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+def forecast_figure(recent_data, forecast_dates, forecast, conf_int, title):
+    """Последние фактические данные + прогноз с доверительным интервалом"""
+    fig = go.Figure()
+
+    # Исторические данные
+    fig.add_trace(_scatter(
+        recent_data.index,
+        recent_data['ipc'],
+        mode='lines',
+        name='Фактические данные',
+        line=dict(color='#2E86AB', width=2)
+    ))
+
+    # Прогноз
+    fig.add_trace(go.Scatter(
+        x=forecast_dates,
+        y=forecast,
+        mode='lines+markers',
+        name='Прогноз',
+        line=dict(color='#A23B72', width=2, dash='dash'),
+        marker=dict(size=8)
+    ))
+
+    # Доверительный интервал
+    fig.add_trace(go.Scatter(
+        x=list(forecast_dates) + list(forecast_dates[::-1]),
+        y=list(conf_int.iloc[:, 1]) + list(conf_int.iloc[:, 0][::-1]),
+        fill='toself',
+        fillcolor='rgba(162, 59, 114, 0.2)',
+        line=dict(color='rgba(255,255,255,0)'),
+        name='95% доверительный интервал',
+        showlegend=True
+    ))
+
+    # Линия 100%
+    fig.add_hline(y=100, line_dash="dash", line_color="gray", opacity=0.5)
+
+    fig.update_layout(
+        title=title,
+        xaxis_title='Дата',
+        yaxis_title='ИПЦ (% к предыдущему месяцу)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=500,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+# Полосы веерной диаграммы (нижний, верхний квантиль) — от широкой к узкой
+FAN_BANDS = [(0.05, 0.95), (0.10, 0.90), (0.25, 0.75)]
+
+
+def fan_figure(recent_data, forecast_dates, quantiles, levels, scenarios, title):
+    """Веерная диаграмма: полосы квантилей Монте-Карло, медиана и сценарии
+
+    quantiles — steps × len(levels), scenarios — steps × число траекторий.
+    """
+    def column(level):
+        return quantiles[:, np.abs(levels - level).argmin()]
+
+    fig = go.Figure()
+    fig.add_trace(_scatter(
+        recent_data.index,
+        recent_data['ipc'],
+        mode='lines',
+        name='Фактические данные',
+        line=dict(color='#2E86AB', width=2)
+    ))
+
+    dates = list(forecast_dates)
+    for i, (low, high) in enumerate(FAN_BANDS):
+        fig.add_trace(go.Scatter(
+            x=dates + dates[::-1],
+            y=list(column(high)) + list(column(low)[::-1]),
+            fill='toself',
+            fillcolor=f'rgba(162, 59, 114, {0.12 + 0.1 * i:.2f})',
+            line=dict(color='rgba(255,255,255,0)'),
+            name=f'{high - low:.0%} интервал',
+            hoverinfo='skip'
+        ))
+
+    for j in range(scenarios.shape[1]):
+        fig.add_trace(go.Scatter(
+            x=dates, y=scenarios[:, j], mode='lines',
+            line=dict(color='rgba(100, 116, 139, 0.5)', width=1),
+            name='Сценарии', legendgroup='scenarios', showlegend=j == 0, hoverinfo='skip'
+        ))
+
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=column(0.5),
+        mode='lines+markers',
+        name='Медиана',
+        line=dict(color='#A23B72', width=2, dash='dash'),
+        marker=dict(size=6)
+    ))
+
+    fig.add_hline(y=100, line_dash="dash", line_color="gray", opacity=0.5)
+    fig.update_layout(
+        title=title,
+        xaxis_title='Дата',
+        yaxis_title='ИПЦ (% к предыдущему месяцу)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=500,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+def history_figure(series, period):
+    """Динамика ИПЦ за выбранный период"""
+    fig = go.Figure()
+    fig.add_trace(_scatter(series.index, series, mode='lines', name='ИПЦ',
+                           line=dict(color='#2E86AB', width=1.5)))
+    fig.add_hline(y=100, line_dash="dash", line_color="gray")
+    fig.update_layout(title=f'Динамика ИПЦ | {period}', xaxis_title='Дата', yaxis_title='ИПЦ (%)',
+                      template='plotly_white', height=400)
+    return fig
+
+
+def heatmap_figure(pivot_table, color_label="ИПЦ (%)", title='Тепловая карта ИПЦ по месяцам и годам'):
+    """Тепловая карта годы × месяцы (по умолчанию — ИПЦ к предыдущему месяцу)"""
+    fig = px.imshow(pivot_table,
+                    labels=dict(x="Месяц", y="Год", color=color_label),
+                    x=MONTHS_RU,
+                    aspect="auto",
+                    color_continuous_scale='RdYlGn_r',
+                    title=title)
+
+    fig.update_layout(height=600)
+    return fig
+
+
+def correlogram_figure(values, nobs, title, yaxis_title, color):
+    """ACF/PACF остатков с границами ±1.96/√n"""
+    bound = 1.96 / np.sqrt(nobs)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=list(range(len(values))), y=values, marker_color=color))
+    fig.add_hline(y=bound, line_dash="dash", line_color="red")
+    fig.add_hline(y=-bound, line_dash="dash", line_color="red")
+    fig.update_layout(title=title, xaxis_title='Лаг', yaxis_title=yaxis_title,
+                      template='plotly_white', height=350)
+    return fig
+
+
+def qq_figure(osm, osr, slope, intercept):
+    """Q-Q график остатков (квантили и прямая из scipy.stats.probplot)"""
+    osm = np.asarray(osm)
+    fig = go.Figure()
+    fig.add_trace(_scatter(osm, osr, mode='markers',
+                           marker=dict(color='#2E86AB', size=5), name='Остатки'))
+    # Прямая — по двум крайним точкам
+    ends = osm[[0, -1]]
+    fig.add_trace(go.Scatter(x=ends, y=intercept + slope*ends,
+                             mode='lines', line=dict(color='red', dash='dash'), name='Теор. норм.'))
+    fig.update_layout(title='Q-Q Plot', xaxis_title='Теоретические квантили',
+                      yaxis_title='Выборочные квантили', template='plotly_white', height=350)
+    return fig
+
+
+def residual_hist_figure(residuals):
+    """Распределение остатков (столбцы считаются здесь, в браузер уходят только они)"""
+    counts, edges = np.histogram(np.asarray(residuals, dtype=float), bins=HIST_BINS)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                         marker_color='#F18F01', name='Частота'))
+    fig.update_layout(title='Распределение остатков', xaxis_title='Остатки', yaxis_title='Частота',
+                      bargap=0, template='plotly_white', height=350, showlegend=False)
+    return fig
+
+
+def residuals_figure(residuals):
+    """Остатки модели во времени"""
+    fig = go.Figure()
+    fig.add_trace(_scatter(residuals.index, residuals, mode='lines',
+                           line=dict(color='#2E86AB', width=1)))
+    fig.add_hline(y=0, line_dash="dash", line_color="red")
+    fig.update_layout(title='Остатки модели во времени',
+                      xaxis_title='Дата', yaxis_title='Остатки',
+                      template='plotly_white', height=300)
+    return fig
+
+
+def backtest_figure(bt_results):
+    """RMSE по горизонту прогноза для нескольких моделей"""
+    fig = go.Figure()
+    for (order, seasonal_order), metrics in bt_results.items():
+        fig.add_trace(go.Scatter(x=metrics.index, y=metrics['RMSE'], mode='lines+markers',
+                                 name=f'SARIMA{order}x{seasonal_order}'))
+    fig.update_layout(title='RMSE по горизонту прогноза', xaxis_title='Горизонт (мес.)',
+                      yaxis_title='RMSE', template='plotly_white', height=400)
+    return fig
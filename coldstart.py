@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Отчёт о времени импорта дашборда (бюджет холодного старта)
+
+Каждый замер — в новом интерпретаторе, как у свежего воркера:
+  * старт — импорт app.py (всё, что выполняется до первой отрисовки),
+    с разбивкой по самым тяжёлым модулям верхнего уровня (-X importtime);
+  * ленивые модули — дополнительное время их импорта поверх старта.
+Код возврата 1, если время старта превышает бюджет.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+LAZY_MODULES = [
+    'plotly.graph_objects',
+    'plotly.express',
+    'scipy.stats',
+    'statsmodels.tsa.stattools',
+    'statsmodels.tsa.statespace.sarimax',
+]
+
+_TIMED_IMPORT = '''
+import time
+import app
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+'''
+
+
+def _run(args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def startup_profile():
+    """Время импорта app.py: (всего, мс; {модуль, импортируемый app.py: мс})"""
+    proc = _run(['-X', 'importtime', '-c', 'import app'])
+    children = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Глубина в дереве импортов — по отступу (2 пробела на уровень);
+        # дочерние модули печатаются перед родительским
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == 'app':
+                return int(cumulative) / 1000, children
+            children = {}
+    raise RuntimeError('app.py не найден в выводе -X importtime')
+
+
+def lazy_cost(module):
+    """Дополнительное время импорта модуля поверх старта, мс"""
+    proc = _run(['-c', _TIMED_IMPORT.format(module=module)])
+    return float(proc.stdout.strip().splitlines()[-1]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Отчёт о времени импорта дашборда')
+    parser.add_argument('--budget-ms', type=float, default=2000, help='бюджет времени старта, мс')
+    parser.add_argument('--repeat', type=int, default=3, help='число замеров (берётся минимум)')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    args = parser.parse_args()
+
+    startup = min((startup_profile() for _ in range(args.repeat)), key=lambda r: r[0])
+    total, modules = startup
+    lazy = {m: min(lazy_cost(m) for _ in range(args.repeat)) for m in LAZY_MODULES}
+    ok = total <= args.budget_ms
+
+    if args.json:
+        print(json.dumps({
+            'startup_ms': round(total, 1),
+            'budget_ms': args.budget_ms,
+            'ok': ok,
+            'startup_modules_ms': {m: round(v, 1) for m, v in modules.items()},
+            'lazy_modules_ms': {m: round(v, 1) for m, v in lazy.items()},
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"Старт (import app): {total:.0f} мс, бюджет {args.budget_ms:.0f} мс — "
+              f"{'OK' if ok else 'ПРЕВЫШЕН'}")
+        for name, ms in sorted(modules.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f'  {ms:8.1f} мс  {name}')
+        print('Ленивые модули (поверх старта):')
+        for name, ms in lazy.items():
+            print(f'  {ms:8.1f} мс  {name}')
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
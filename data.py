@@ -0,0 +1,118 @@
+"""
+Загрузка данных ИПЦ
+
+Основной источник — колоночный кэш (cache/ipc), который строит ingest.py
+из выгрузки Росстата: по одному бинарному файлу float64 на колонку,
+читается через np.memmap без разбора текста. Если кэша нет или CSV
+изменён после последней загрузки — читается output/ipc_monthly.csv.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+IPC_CSV = 'output/ipc_monthly.csv'
+STORE_DIR = Path(os.environ.get('IPC_STORE_DIR', 'cache/ipc'))
+
+MONTHS_RU = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн',
+             'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек']
+
+
+def write_atomic(path, text):
+    """Атомарная запись текста (или bytes); False, если содержимое не изменилось"""
+    path = Path(path)
+    binary = isinstance(text, bytes)
+    if path.exists() and (path.read_bytes() if binary else path.read_text(encoding='utf-8')) == text:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)    # mkstemp создаёт 0600 — файлы читают nginx и другие сервисы
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return True
+
+
+def file_stamp(path):
+    """(mtime, размер) файла — признак изменения без чтения содержимого"""
+    stat = Path(path).stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def read_store_meta(store_dir=STORE_DIR):
+    """Метаданные колоночного кэша (None, если кэша нет)"""
+    try:
+        return json.loads((Path(store_dir) / 'meta.json').read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def read_store(store_dir=STORE_DIR, meta=None):
+    """Чтение колоночного кэша в DataFrame с индексом date"""
+    store_dir = Path(store_dir)
+    meta = meta or read_store_meta(store_dir)
+    n = meta['n']
+    columns = {
+        name: np.array(np.memmap(store_dir / f'{name}.f64', dtype='<f8', mode='r', shape=(n,)))
+        for name in meta['columns']
+    }
+    # Индекс — из арифметики месяцев numpy: pd.date_range с freq='MS'
+    # в разы дороже чтения самих столбцов
+    months = np.datetime64(meta['start'], 'M') + np.arange(n)
+    index = pd.DatetimeIndex(months.astype('datetime64[us]'), freq='MS', name='date')
+    return pd.DataFrame(columns, index=index)
+
+
+def _store_is_fresh(meta, path, store_dir=STORE_DIR):
+    """Кэш актуален, если CSV не менялся после последней загрузки
+
+    и размеры файлов столбцов совпадают с meta['n'] (кэш, оставленный
+    прерванной или идущей загрузкой, не читается — берётся CSV).
+    """
+    if meta is None:
+        return False
+    try:
+        if any((Path(store_dir) / f'{name}.f64').stat().st_size != meta['n'] * 8
+               for name in meta['columns']):
+            return False
+    except FileNotFoundError:
+        return False
+    try:
+        return meta.get('csv_stamp') == file_stamp(path)
+    except FileNotFoundError:
+        return True
+
+
+def read_ipc(path=IPC_CSV):
+    """Чтение помесячного ряда ИПЦ (% к предыдущему месяцу)"""
+    if path == IPC_CSV:
+        meta = read_store_meta()
+        if _store_is_fresh(meta, path):
+            with metrics.stage('load.store'):
+                return read_store(meta=meta)
+    with metrics.stage('load.csv'):
+        return pd.read_csv(path, parse_dates=['date'], index_col='date')
+
+
+def data_version(path=IPC_CSV):
+    """Дешёвый токен версии данных для инвалидации кэшей"""
+    meta = read_store_meta()
+    if _store_is_fresh(meta, path):
+        return f"store:{meta['start']}:{meta['n']}:{meta['revision']}"
+    return 'csv:' + ':'.join(map(str, file_stamp(path)))
+
+
+def month_year_table(df, column='ipc'):
+    """Матрица год × месяц для тепловой карты"""
+    table = df.pivot_table(values=column, index=df.index.year, columns=df.index.month, aggfunc='mean')
+    return table.rename_axis(index='year', columns='month')
@@ -0,0 +1,51 @@
+"""
+Прореживание рядов для графиков с сохранением формы (LTTB)
+
+Largest-Triangle-Three-Buckets: ряд делится на корзины, из каждой
+берётся точка, образующая наибольший треугольник с выбранной точкой
+предыдущей корзины и средним следующей — пики, провалы и изломы
+остаются на графике, а число точек не зависит от длины ряда.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """Индексы n_out точек ряда (x, y) по LTTB; первая и последняя сохраняются"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # n_out - 2 корзины между первой и последней точкой
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # Средние корзин — сразу для всех; для последней «следующая» — последняя точка
+    sizes = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1])[1:] / sizes[1:], x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1])[1:] / sizes[1:], y[-1])
+
+    indices = np.empty(n_out, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xa, ya = x[a], y[a]
+        # Удвоенная площадь треугольника: выбранная точка, кандидат, среднее следующей корзины
+        area = np.abs((xa - mean_x[i]) * (y[lo:hi] - ya) - (xa - x[lo:hi]) * (mean_y[i] - ya))
+        a = lo + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def lttb(series, max_points):
+    """Ряд pandas, прореженный до max_points точек (короткий — без изменений)
+
+    Ось x — индекс ряда: даты (наносекунды) или числа.
+    """
+    if len(series) <= max_points:
+        return series
+    index = series.index
+    x = index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy(dtype=float)
+    return series.iloc[lttb_indices(x, series.to_numpy(dtype=float), max_points)]
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Экспорт данных для React фронтенда (frontend/data/cpi.json, indicators.json)
+
+Пайплайн состоит из стадий. Каждая стадия запоминает хэш своих входов
+(содержимое CSV, конфигурация модели) и пропускается, если он
+не изменился с прошлого запуска. Файлы пишутся атомарно и только
+при изменении содержимого.
+
+Фронтенд не включает данные в бандл, а загружает их из frontend/public/data:
+файлы с хэшем содержимого в имени (кэшируются навсегда) рядом с готовыми
+.gz/.br версиями для gzip_static в nginx и manifest.json (без кэша) —
+имя → файл. Краткая сводка ИПЦ (текущее значение, прогноз) отделена
+от полной истории, поэтому первая отрисовка загружает несколько КБ.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:     # .br версии не пишутся, nginx отдаёт .gz
+    brotli = None
+
+from data import IPC_CSV, MONTHS_RU, read_ipc, write_atomic
+from modeling import fit_sarima_window, forecast_sarima
+
+FRONTEND_DATA = Path('frontend/data')
+PUBLIC_DATA = Path('frontend/public/data')
+STATE_DIR = Path(os.environ.get('IPC_EXPORT_DIR', 'cache/export'))
+
+DEFAULT_ORDER = (1, 0, 1)
+DEFAULT_SEASONAL_ORDER = (1, 0, 1, 12)
+DEFAULT_STEPS = 12
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_stage(name, inputs, compute, force=False):
+    """Стадия пайплайна: пересчёт только при изменении входов
+
+    Возвращает (результат, был ли пересчёт).
+    """
+    key = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+    path = STATE_DIR / f'{name}.json'
+    if not force and path.exists():
+        state = json.loads(path.read_text(encoding='utf-8'))
+        if state['key'] == key:
+            return state['result'], False
+    result = compute()
+    write_atomic(path, json.dumps({'key': key, 'result': result}, ensure_ascii=False))
+    return result, True
+
+
+def to_frontend_json(obj):
+    """JSON в формате файлов фронтенда: массивы записей — по одной на строку"""
+    lines = ['{']
+    items = list(obj.items())
+    for i, (key, value) in enumerate(items):
+        comma = ',' if i < len(items) - 1 else ''
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            rows = [json.dumps(row, ensure_ascii=False) for row in value]
+            lines.append(f'  {json.dumps(key)}: [')
+            lines.extend(f'    {row},' for row in rows[:-1])
+            lines.append(f'    {rows[-1]}')
+            lines.append(f'  ]{comma}')
+        else:
+            rendered = json.dumps(value, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            lines.append(f'  {json.dumps(key)}: {rendered}{comma}')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def publish(artifacts, out_dir=PUBLIC_DATA):
+    """Публикация JSON-артефактов {имя: объект} с хэшем содержимого в имени файла
+
+    Для каждого пишутся <имя>.<хэш>.json, .json.gz и .json.br (если есть
+    модуль brotli; недостающие версии дописываются и к уже
+    опубликованным файлам), затем manifest.json. Файлы предыдущего манифеста
+    остаются — клиенты, загрузившие его, дочитают свою версию; более
+    старые удаляются. Возвращает True, если манифест изменился.
+    """
+    out_dir = Path(out_dir)
+    manifest_path = out_dir / 'manifest.json'
+    previous = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+
+    manifest = {}
+    for name, obj in artifacts.items():
+        body = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        filename = f'{name}.{hashlib.sha256(body).hexdigest()[:12]}.json'
+        path = out_dir / filename
+        # Недостающие сжатые версии дописываются и к уже опубликованному
+        # файлу — например, .br после установки brotli
+        compressors = {'.gz': lambda: gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressors['.br'] = lambda: brotli.compress(body, quality=11)
+        for suffix, compress in compressors.items():
+            variant = path.with_name(filename + suffix)
+            if not variant.exists():
+                write_atomic(variant, compress())
+        # Основной файл — последним: его наличие означает, что версии готовы
+        if not path.exists():
+            write_atomic(path, body)
+        manifest[name] = filename
+
+    changed = write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2) + '\n')
+    if changed:
+        keep = set(manifest.values()) | set(previous.values())
+        for path in out_dir.glob('*.json*'):
+            if path.name != 'manifest.json' and path.name.split('.json')[0] + '.json' not in keep:
+                path.unlink()
+    return changed
+
+
+def _date(ts):
+    return ts.strftime('%Y-%m-%d')
+
+
+def history_payload(df):
+    """Текущее/предыдущее значение, статистика и полный ряд"""
+    ipc = df['ipc']
+    return {
+        'current': {
+            'value': round(float(ipc.iloc[-1]), 2),
+            'date': _date(ipc.index[-1]),
+            'change': round(float(ipc.iloc[-1] - ipc.iloc[-2]), 2),
+        },
+        'previous': {
+            'value': round(float(ipc.iloc[-2]), 2),
+            'date': _date(ipc.index[-2]),
+        },
+        'stats': {
+            'highest': {'value': round(float(ipc.max()), 2), 'date': _date(ipc.idxmax())},
+            'lowest': {'value': round(float(ipc.min()), 2), 'date': _date(ipc.idxmin())},
+            'average': round(float(ipc.mean()), 2),
+        },
+        'data': [{'date': _date(d), 'value': round(float(v), 2)} for d, v in ipc.items()],
+    }
+
+
+def forecast_payload(df, order, seasonal_order, steps, start=None, end=None):
+    """Прогноз SARIMA с 95% доверительным интервалом
+
+    Модель обучается на окне [start, end] (по умолчанию — весь ряд, как
+    в дашборде); прогноз начинается с месяца после конца окна.
+    """
+    ipc = df['ipc']
+    model_fit = fit_sarima_window(ipc, start or ipc.index[0], end or ipc.index[-1], order, seasonal_order)
+    forecast, conf_int = forecast_sarima(model_fit, steps)
+    return [
+        {'date': _date(d), 'value': round(float(v), 2),
+         'lower': round(float(lo), 2), 'upper': round(float(hi), 2)}
+        for d, v, lo, hi in zip(forecast.index, forecast.values,
+                                conf_int.iloc[:, 0].values, conf_int.iloc[:, 1].values)
+    ]
+
+
+def export(csv_path=IPC_CSV, out_dir=FRONTEND_DATA, order=DEFAULT_ORDER,
+           seasonal_order=DEFAULT_SEASONAL_ORDER, steps=DEFAULT_STEPS, force=False, public_dir=PUBLIC_DATA,
+           start=None, end=None):
+    """Запуск пайплайна экспорта; возвращает словарь {стадия: была ли выполнена}
+
+    start, end — окно обучения модели прогноза (None — начало/конец ряда).
+    """
+    out_dir = Path(out_dir)
+    csv_hash = file_hash(csv_path)
+    frame = {}
+
+    def load():
+        if 'df' not in frame:
+            frame['df'] = read_ipc(csv_path)
+        return frame['df']
+
+    report = {}
+    history, report['history'] = run_stage(
+        'history', {'csv': csv_hash}, lambda: history_payload(load()), force)
+    forecast, report['forecast'] = run_stage(
+        'forecast',
+        {'csv': csv_hash, 'order': list(order), 'seasonal_order': list(seasonal_order), 'steps': steps,
+         'start': start, 'end': end},
+        lambda: forecast_payload(load(), order, seasonal_order, steps, start, end), force)
+
+    # cpi.json: статические поля (описание, методология) берутся из текущего файла
+    cpi_path = out_dir / 'cpi.json'
+    cpi = json.loads(cpi_path.read_text(encoding='utf-8')) if cpi_path.exists() else {}
+    cpi.update(current=history['current'], previous=history['previous'],
+               stats=history['stats'], forecast=forecast, data=history['data'])
+    report['cpi.json'] = write_atomic(cpi_path, to_frontend_json(cpi))
+    summary = {key: value for key, value in cpi.items() if key != 'data'}
+    artifacts = {'cpi': summary, 'cpi-history': {'data': cpi['data']}}
+
+    # indicators.json: обновляется только карточка ИПЦ
+    indicators_path = out_dir / 'indicators.json'
+    if indicators_path.exists():
+        indicators = json.loads(indicators_path.read_text(encoding='utf-8'))
+        current = history['current']
+        year, month = int(current['date'][:4]), int(current['date'][5:7])
+        for indicator in indicators:
+            if indicator['code'] == 'cpi':
+                indicator['current'].update(value=current['value'], change=current['change'],
+                                            date=f'{MONTHS_RU[month - 1]} {year}')
+        text = json.dumps(indicators, ensure_ascii=False, indent=2) + '\n'
+        report['indicators.json'] = write_atomic(indicators_path, text)
+        artifacts['indicators'] = indicators
+
+    if public_dir:
+        report['manifest.json'] = publish(artifacts, public_dir)
+    return report
+
+
+def _parse_ints(text):
+    return tuple(int(v) for v in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Экспорт данных ИПЦ для фронтенда')
+    parser.add_argument('--csv', default=IPC_CSV)
+    parser.add_argument('--out', default=str(FRONTEND_DATA))
+    parser.add_argument('--public', default=str(PUBLIC_DATA),
+                        help='каталог артефактов для фронтенда ("" — не публиковать)')
+    parser.add_argument('--order', type=_parse_ints, default=DEFAULT_ORDER, help='p,d,q')
+    parser.add_argument('--seasonal-order', type=_parse_ints, default=DEFAULT_SEASONAL_ORDER, help='P,D,Q,s')
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS)
+    parser.add_argument('--start', help='начало окна обучения, ГГГГ-ММ-ДД (по умолчанию — начало ряда)')
+    parser.add_argument('--end', help='конец окна обучения (по умолчанию — последний месяц ряда)')
+    parser.add_argument('--force', action='store_true', help='пересчитать все стадии')
+    args = parser.parse_args()
+
+    report = export(args.csv, args.out, args.order, args.seasonal_order, args.steps, args.force,
+                    args.public or None, args.start, args.end)
+    for stage, done in report.items():
+        print(f"{stage}: {'обновлено' if done else 'без изменений'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Общая очередь точных обучений SARIMA для всех сессий дашборда
+
+Одна очередь на процесс Streamlit (st.cache_resource):
+  * одинаковые запросы (тот же ключ модели) из разных сессий
+    объединяются — обучение идёт один раз, все ждут один future;
+  * у каждой сессии актуален только последний запрос: предыдущий,
+    если он ещё в очереди и больше никому не нужен, отменяется;
+  * из очереди первыми берутся самые свежие запросы;
+  * одновременно выполняется не больше max_workers обучений,
+    и не больше per_session — по запросам одной сессии.
+Уже запущенное обучение не прерывается: его результат сохранится
+в model_store и пригодится при возврате к этой модели. Неудачное
+обучение FAILED_TTL секунд не повторяется: submit с тем же ключом
+возвращает завершённый с ошибкой future, и дашборд переходит
+к обучению в сессии вместо ежесекундной повторной отправки.
+
+Пакетные задачи дашборда (подбор порядка, бэктест) выполняются
+через map() в отдельном небольшом пуле (batch_workers процессов):
+сотни задач перебора сетки не встают в очередь перед точными
+обучениями других сессий. Сломанный пул (BrokenProcessPool —
+например, рабочий процесс убит OOM) пересоздаётся, ожидавшие его
+запросы получают исключение вместо вечного ожидания.
+
+Метрики, собранные в процессах пула (стадии обучения, итерации
+оптимизатора, попадания model_store), возвращаются вместе
+с результатом каждой задачи и добавляются к метрикам процесса
+Streamlit — панель ?debug=1 и loadtest видят и фоновые обучения.
+"""
+
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+FAILED_TTL = 60.0   # секунд хранится неудачный результат обучения
+
+
+def _init_worker(collect):
+    """Сбор метрик в процессе пула, если он включён у родителя
+
+    JSON-логи стадий пишутся, только если метрики включены переменной
+    IPC_METRICS (как у родителя); иначе агрегаты собираются молча.
+    """
+    if collect and not metrics.enabled():
+        metrics.logger.addHandler(logging.NullHandler())
+        metrics.enable()
+
+
+def _call(fn, *args):
+    """fn(*args) в процессе пула вместе с метриками, накопленными в нём"""
+    return fn(*args), metrics.drain()
+
+
+def _merged(result):
+    value, worker_metrics = result
+    metrics.merge(worker_metrics)
+    return value
+
+
+class _Job:
+    def __init__(self, fn, args, session):
+        self.fn = fn
+        self.args = args
+        self.sessions = {session}       # сессии, которым нужен результат
+        self.started_by = set()         # сессии на момент запуска (для лимита)
+        self.future = Future()
+
+
+class FitQueue:
+    def __init__(self, max_workers=None, per_session=1, batch_workers=None):
+        self.max_workers = max_workers or int(os.environ.get('IPC_FIT_WORKERS', 0)) or max(1, (os.cpu_count() or 2) // 2)
+        self.batch_workers = batch_workers or int(os.environ.get('IPC_BATCH_WORKERS', 0)) or 1
+        self.per_session = per_session
+        self.pool = self._new_pool()
+        self.batch_pool = self._new_pool(self.batch_workers)
+        # RLock: колбэк уже завершённого future выполняется сразу в pool.submit (под блокировкой)
+        self._lock = threading.RLock()
+        self._pending = OrderedDict()   # key -> _Job, в конце — самые свежие
+        self._running = {}              # key -> _Job
+        self._latest = {}               # session -> последний ключ
+        self._failed = {}               # key -> (срок хранения, future с ошибкой)
+
+    def _new_pool(self, max_workers=None):
+        return ProcessPoolExecutor(max_workers=max_workers or self.max_workers,
+                                   mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=(metrics.enabled(),))
+
+    def _replace_pool(self, broken):
+        """Новый пул вместо сломанного broken (под self._lock; повторный вызов — без эффекта)"""
+        if self.pool is broken:
+            metrics.count('fitqueue.pool_restarts')
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+        elif self.batch_pool is broken:
+            metrics.count('fitqueue.batch_pool_restarts')
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.batch_pool = self._new_pool(self.batch_workers)
+
+    def map(self, fn, iterable):
+        """Пакетная задача (подбор порядка, бэктест) в пакетном пуле: список fn(x)
+
+        Как executor.map — поэтому очередь передаётся в search_orders и
+        backtest_orders вместо пула. Сломанный пул пересоздаётся, ошибка
+        пробрасывается вызывающему.
+        """
+        with self._lock:
+            pool = self.batch_pool
+        try:
+            return [_merged(result) for result in pool.map(functools.partial(_call, fn), iterable)]
+        except BrokenProcessPool:
+            with self._lock:
+                self._replace_pool(pool)
+            raise
+
+    def submit(self, session, key, fn, *args):
+        """Запрос обучения fn(*args) для сессии; возвращает future результата"""
+        with self._lock:
+            now = time.monotonic()
+            self._failed = {k: v for k, v in self._failed.items() if v[0] > now}
+            previous = self._latest.get(session)
+            if previous is not None and previous != key:
+                self._release(session, previous)
+            if key in self._failed:
+                metrics.count('fitqueue.failed_reused')
+                self._latest.pop(session, None)
+                return self._failed[key][1]
+            self._latest[session] = key
+
+            job = self._running.get(key) or self._pending.get(key)
+            if job is not None:
+                metrics.count('fitqueue.joined')
+                job.sessions.add(session)
+                if key in self._pending:
+                    self._pending.move_to_end(key)
+            else:
+                metrics.count('fitqueue.submitted')
+                job = self._pending[key] = _Job(fn, args, session)
+            failed = self._pump()
+        self._fail(failed)
+        return job.future
+
+    def _release(self, session, key):
+        """Сессия больше не ждёт key: ненужный никому запрос из очереди отменяется"""
+        job = self._pending.get(key) or self._running.get(key)
+        if job is None:
+            return
+        job.sessions.discard(session)
+        if not job.sessions and key in self._pending:
+            del self._pending[key]
+            job.future.cancel()
+            metrics.count('fitqueue.cancelled')
+
+    def _load(self, session):
+        return sum(session in job.started_by for job in self._running.values())
+
+    def _pump(self):
+        """Запуск самых свежих запросов в пределах лимитов (под self._lock)
+
+        Возвращает [(job, исключение)] — запросы, которые не удалось
+        отправить в пул; их future завершаются после снятия блокировки.
+        """
+        failed = []
+        while len(self._running) < self.max_workers:
+            key = next((k for k in reversed(self._pending)
+                        if any(self._load(s) < self.per_session for s in self._pending[k].sessions)), None)
+            if key is None:
+                break
+            job = self._pending.pop(key)
+            job.started_by = set(job.sessions)
+            job.future.set_running_or_notify_cancel()
+            pool = self.pool
+            try:
+                done = pool.submit(_call, job.fn, *job.args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._forget(key, job)
+                self._remember_failure(key, job)
+                self._replace_pool(pool)
+                failed.append((job, e))
+                continue
+            self._running[key] = job
+            done.add_done_callback(lambda done, key=key, pool=pool: self._finished(key, pool, done))
+        metrics.observe('fitqueue.pending', len(self._pending))
+        return failed
+
+    def _forget(self, key, job):
+        """Сессии, ждавшие завершённый key, больше не числятся в _latest"""
+        for session in job.sessions:
+            if self._latest.get(session) == key:
+                del self._latest[session]
+
+    def _remember_failure(self, key, job):
+        """Неудачный key не отправляется повторно FAILED_TTL секунд (под self._lock)"""
+        self._failed[key] = (time.monotonic() + FAILED_TTL, job.future)
+
+    @staticmethod
+    def _fail(failed):
+        for job, error in failed:
+            metrics.count('fitqueue.failed')
+            job.future.set_exception(error)
+
+    def _finished(self, key, pool, done):
+        # Задача, отменённая при замене сломанного пула, — та же поломка пула
+        error = BrokenProcessPool('пул обучений пересоздан') if done.cancelled() else done.exception()
+        with self._lock:
+            job = self._running.pop(key)
+            self._forget(key, job)
+            if error is not None:
+                self._remember_failure(key, job)
+            if isinstance(error, BrokenProcessPool):
+                self._replace_pool(pool)
+            failed = self._pump()
+        self._fail(failed)
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(_merged(done.result()))
+
+    def status(self):
+        """Размер очереди: {'running': n, 'pending': n}"""
+        with self._lock:
+            return {'running': len(self._running), 'pending': len(self._pending)}
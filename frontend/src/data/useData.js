@@ -0,0 +1,60 @@
+import { useEffect, useState } from 'react';
+
+// Данные не входят в бандл: python export.py публикует их в public/data.
+// manifest.json (запрашивается без кэша) сопоставляет имени файл
+// с хэшем содержимого — такие файлы кэшируются браузером навсегда,
+// и обновление данных не меняет и не перезагружает бандл.
+const DATA_URL = `${import.meta.env.BASE_URL}data/`;
+
+let manifest = null;
+const loaded = new Map();
+
+async function fetchJson(url, options) {
+  const response = await fetch(url, options);
+  if (!response.ok) {
+    throw new Error(`${url}: ${response.status}`);
+  }
+  return response.json();
+}
+
+function loadManifest() {
+  if (!manifest) {
+    manifest = fetchJson(`${DATA_URL}manifest.json`, { cache: 'no-cache' })
+      .catch(error => {
+        manifest = null;
+        throw error;
+      });
+  }
+  return manifest;
+}
+
+export function loadData(name) {
+  if (!loaded.has(name)) {
+    const request = loadManifest()
+      .then(files => fetchJson(DATA_URL + files[name]))
+      .catch(error => {
+        loaded.delete(name);
+        throw error;
+      });
+    loaded.set(name, request);
+  }
+  return loaded.get(name);
+}
+
+// { data, error }: data === null, пока файл загружается
+export function useData(name) {
+  const [state, setState] = useState({ name, data: null, error: null });
+
+  useEffect(() => {
+    let active = true;
+    loadData(name).then(
+      data => active && setState({ name, data, error: null }),
+      error => active && setState({ name, data: null, error })
+    );
+    return () => {
+      active = false;
+    };
+  }, [name]);
+
+  return state.name === name ? state : { name, data: null, error: null };
+}
@@ -1,8 +1,11 @@
 import { Link } from 'react-router-dom';
-import indicators from '../data/indicators.json';
+import { useData } from '../data/useData';
 import './Home.css';
 
 export default function Home() {
+  const { data } = useData('indicators');
+  const indicators = data ?? [];
+  
   return (
     <div className="home">
       <section className="hero">
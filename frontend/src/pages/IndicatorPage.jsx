@@ -1,10 +1,22 @@
 import { useState } from 'react';
 import { IndicatorCard, InteractiveChart, DataTable } from '../components';
-import cpiData from '../data/cpi.json';
+import { useData } from '../data/useData';
 import './IndicatorPage.css';
 
 export default function IndicatorPage() {
   const [showForecast, setShowForecast] = useState(true);
+  // Сводка (несколько КБ) отрисовывается сразу, история подгружается следом
+  const { data: cpiData, error } = useData('cpi');
+  const { data: history } = useData('cpi-history');
+  const series = history ? history.data : [];
+  
+  if (!cpiData) {
+    return (
+      <div className="indicator-page">
+        <p className="page-subtitle">{error ? 'Не удалось загрузить данные' : 'Загрузка данных…'}</p>
+      </div>
+    );
+  }
   
   return (
     <div className="indicator-page">
@@ -58,7 +70,7 @@ export default function IndicatorPage() {
         </div>
         
         <InteractiveChart 
-          data={cpiData.data}
+          data={series}
           forecast={cpiData.forecast}
           showForecast={showForecast}
           title={`${cpiData.name} | ${cpiData.frequency}`}
@@ -149,7 +161,7 @@ export default function IndicatorPage() {
       {/* Historical Data Table */}
       <section className="data-section">
         <DataTable 
-          data={cpiData.data}
+          data={series}
           title="Исторические данные"
         />
       </section>
@@ -1,10 +1,16 @@
 import { useParams, Link } from 'react-router-dom';
-import indicators from '../data/indicators.json';
+import { useData } from '../data/useData';
 import './StubIndicator.css';
 
 export default function StubIndicator() {
   const { code } = useParams();
-  const indicator = indicators.find(i => i.code === code);
+  const { data: indicators, error } = useData('indicators');
+
+  if (!indicators && !error) {
+    return <div className="stub-page" />;
+  }
+
+  const indicator = indicators?.find(i => i.code === code);
 
   if (!indicator) {
     return (
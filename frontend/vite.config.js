@@ -4,4 +4,10 @@ import react from '@vitejs/plugin-react'
 // https://vite.dev/config/
 export default defineConfig({
   plugins: [react()],
+  server: {
+    // API прогнозов (python api.py) в режиме разработки
+    proxy: {
+      '/api': 'http://127.0.0.1:8000',
+    },
+  },
 })
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Реестр экономических индикаторов и планировщик пакетного обучения моделей
+
+Каждый индикатор описывает источник ряда, частоту и порядок SARIMA.
+Планировщик обучает модели всех индикаторов с данными в ограниченном
+пуле процессов: сначала устаревшие (данные изменились или модели нет),
+начиная с самых давно обновлённых; актуальные пропускаются.
+Модели кэшируются тем же model_store, что и в дашборде.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+import model_store
+from data import read_ipc, write_atomic
+from modeling import fit_sarima, forecast_sarima
+
+STATE_DIR = Path(os.environ.get('IPC_INDICATORS_DIR', 'cache/indicators'))
+
+
+@dataclass(frozen=True)
+class Indicator:
+    """Описание индикатора (code совпадает с frontend/data/indicators.json)"""
+    code: str
+    name: str
+    source: str                 # CSV с колонками date,<column>
+    column: str = 'value'
+    freq: str = 'MS'            # MS — месячные, QS — квартальные данные
+    order: tuple = (1, 0, 1)
+    seasonal_order: tuple = (1, 0, 1, 12)
+    forecast_steps: int = 12
+
+    def available(self):
+        return Path(self.source).exists()
+
+    def load(self):
+        """Ряд индикатора с регулярным индексом дат"""
+        if self.code == 'cpi':
+            series = read_ipc()[self.column]
+        else:
+            series = pd.read_csv(self.source, parse_dates=['date'], index_col='date')[self.column]
+        return series.asfreq(self.freq)
+
+
+REGISTRY = {
+    indicator.code: indicator for indicator in [
+        Indicator('cpi', 'Индекс потребительских цен', 'output/ipc_monthly.csv', column='ipc'),
+        Indicator('unemployment', 'Уровень безработицы', 'output/unemployment_monthly.csv',
+                  order=(1, 1, 1), seasonal_order=(0, 0, 1, 12)),
+        Indicator('key-rate', 'Ключевая ставка ЦБ РФ', 'output/key_rate_monthly.csv',
+                  order=(1, 1, 0), seasonal_order=(0, 0, 0, 12)),
+    ]
+}
+
+
+def register(indicator):
+    """Добавление индикатора в реестр"""
+    REGISTRY[indicator.code] = indicator
+    return indicator
+
+
+def _state_path(code):
+    return STATE_DIR / f'{code}.json'
+
+
+def load_state(code):
+    """Последний результат обучения индикатора (None, если не обучался)"""
+    try:
+        return json.loads(_state_path(code).read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _config(indicator):
+    return [list(indicator.order), list(indicator.seasonal_order), indicator.forecast_steps]
+
+
+def plan(codes=None, force=False):
+    """Очередь обучения: [(indicator, data_hash)], устаревшие — первыми
+
+    Порядок: сначала индикаторы без результата, затем — с самым
+    старым обновлением. Актуальные (тот же хэш данных и конфигурация)
+    пропускаются, если не задан force.
+    """
+    queue = []
+    for code in codes or REGISTRY:
+        indicator = REGISTRY[code]
+        if not indicator.available():
+            continue
+        dhash = model_store.data_hash(indicator.load())
+        state = load_state(code)
+        fresh = (state is not None and state['data_hash'] == dhash
+                 and state['config'] == _config(indicator))
+        if fresh and not force:
+            continue
+        queue.append((indicator, dhash, state['updated'] if state else 0.0))
+    queue.sort(key=lambda item: item[2])
+    return [(indicator, dhash) for indicator, dhash, _ in queue]
+
+
+def fit_indicator(indicator):
+    """Обучение модели индикатора и сохранение прогноза"""
+    series = indicator.load()
+    started = time.perf_counter()
+    model_fit = fit_sarima(series, indicator.order, indicator.seasonal_order)
+    forecast, conf_int = forecast_sarima(model_fit, indicator.forecast_steps)
+    state = {
+        'code': indicator.code,
+        'data_hash': model_store.data_hash(series),
+        'config': _config(indicator),
+        'updated': time.time(),
+        'fit_seconds': round(time.perf_counter() - started, 3),
+        'aic': float(model_fit.aic),
+        'last': {'date': str(series.index[-1].date()), 'value': float(series.iloc[-1])},
+        'forecast': [
+            {'date': str(d.date()), 'value': float(v), 'lower': float(lo), 'upper': float(hi)}
+            for d, v, lo, hi in zip(forecast.index, forecast.values,
+                                    conf_int.iloc[:, 0].values, conf_int.iloc[:, 1].values)
+        ],
+    }
+    write_atomic(_state_path(indicator.code), json.dumps(state, ensure_ascii=False, indent=2))
+    return state
+
+
+def refresh(codes=None, force=False, max_workers=None):
+    """Пакетное обучение устаревших индикаторов; возвращает {code: state или ошибка}"""
+    queue = plan(codes, force)
+    if not queue:
+        return {}
+    workers = min(len(queue), max_workers or os.cpu_count() or 1)
+    results = {}
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        # Задачи отправляются в порядке приоритета: при ограниченном пуле
+        # самые устаревшие индикаторы обучаются первыми
+        futures = {pool.submit(fit_indicator, indicator): indicator.code for indicator, _ in queue}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                results[code] = future.result()
+            except Exception as e:
+                results[code] = {'error': f'{type(e).__name__}: {e}'}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетное обучение моделей индикаторов')
+    parser.add_argument('codes', nargs='*', help='коды индикаторов (по умолчанию — все)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='переобучить и актуальные')
+    args = parser.parse_args()
+
+    unknown = [code for code in args.codes if code not in REGISTRY]
+    if unknown:
+        parser.error(f"неизвестные индикаторы: {', '.join(unknown)}")
+
+    for code in args.codes or REGISTRY:
+        if not REGISTRY[code].available():
+            print(f'{code}: нет данных ({REGISTRY[code].source})')
+    results = refresh(args.codes or None, args.force, args.workers)
+    for code, state in results.items():
+        if 'error' in state:
+            print(f"{code}: ошибка — {state['error']}")
+        else:
+            print(f"{code}: обучено за {state['fit_seconds']} с, AIC={state['aic']:.1f}")
+    if not results:
+        print('Все модели актуальны')
+
+
+if __name__ == "__main__":
+    main()
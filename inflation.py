@@ -0,0 +1,60 @@
+"""
+Накопленная инфляция по помесячному ряду ИПЦ
+
+Значения ряда — индексы к предыдущему месяцу (100.5 = +0.5% за месяц),
+поэтому инфляция за период — произведение индексов, а не среднее.
+InflationIndex один раз (векторно) считает префиксные суммы логарифмов
+L[k] = Σ log(ipc[i] / 100), i < k; рост цен за месяцы [s, e] —
+exp(L[e + 1] - L[s]). Любой запрос по диапазону — O(1) без прохода по ряду.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class InflationIndex:
+    def __init__(self, series):
+        """series — помесячный ряд ИПЦ (% к предыдущему месяцу) с индексом-датой"""
+        index = pd.DatetimeIndex(series.index)
+        self.start = index[0].to_period('M')
+        self.n = len(index)
+        if not (index.to_period('M') == pd.period_range(self.start, periods=self.n, freq='M')).all():
+            raise ValueError('ряд должен быть помесячным без пропусков')
+        self.dates = index
+        self.log_cum = np.concatenate([[0.0], np.cumsum(np.log(series.to_numpy(dtype=float) / 100))])
+
+    def position(self, date):
+        """Номер месяца date в ряде (KeyError, если месяц вне ряда)"""
+        pos = (pd.Timestamp(date).to_period('M') - self.start).n
+        if not 0 <= pos < self.n:
+            raise KeyError(f'{pd.Timestamp(date):%Y-%m} вне ряда')
+        return pos
+
+    def growth(self, start, end):
+        """Рост цен за месяцы [start, end] включительно, в разах"""
+        s, e = self.position(start), self.position(end)
+        if e < s:
+            raise ValueError('конец периода раньше начала')
+        return float(np.exp(self.log_cum[e + 1] - self.log_cum[s]))
+
+    def cumulative(self, start, end):
+        """Накопленная инфляция за месяцы [start, end], %"""
+        return (self.growth(start, end) - 1) * 100
+
+    def annualized(self, start, end):
+        """Среднегодовая инфляция за месяцы [start, end], % в год"""
+        months = self.position(end) - self.position(start) + 1
+        return (self.growth(start, end) ** (12 / months) - 1) * 100
+
+    def yoy(self, date):
+        """Инфляция за 12 месяцев, заканчивающихся date, % (None в первый год ряда)"""
+        end = self.position(date)
+        if end < 11:
+            return None
+        return float(np.expm1(self.log_cum[end + 1] - self.log_cum[end - 11]) * 100)
+
+    def yoy_series(self):
+        """Инфляция год к году для всех месяцев ряда, % (NaN в первые 11 месяцев)"""
+        values = np.full(self.n, np.nan)
+        values[11:] = np.expm1(self.log_cum[12:] - self.log_cum[:-12]) * 100
+        return pd.Series(values, index=self.dates, name='yoy')
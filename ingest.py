@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Загрузка выгрузки Росстата (ipc_mes_MM-YYYY.xlsx) в колоночный кэш
+
+Лист «01» — годы по столбцам, месяцы по строкам в разделе
+«к концу предыдущего месяца». Книга читается потоково (read_only),
+из неё берутся только столбцы начиная с последнего года в кэше:
+новые месяцы добавляются к сохранённому ряду, история из книги
+не перечитывается. Если Росстат пересмотрел уже загруженные значения,
+ряд заменяется с первого изменённого месяца.
+
+Запись атомарна и упорядочена: сначала CSV, затем бинарный файл
+(временный файл + os.replace), последним — meta.json. Пока meta.json
+не обновлён, CSV новее отметки в нём, и читатели берут данные из CSV;
+прерванная загрузка не оставляет кэш, не согласованный с meta.json.
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from data import IPC_CSV, STORE_DIR, file_stamp, read_store, read_store_meta, write_atomic
+
+SHEET = '01'
+COLUMN = 'ipc'
+MONTHS = ['январь', 'февраль', 'март', 'апрель', 'май', 'июнь',
+          'июль', 'август', 'сентябрь', 'октябрь', 'ноябрь', 'декабрь']
+SECTION_END = 'к декабрю предыдущего года'
+
+
+def _to_float(value):
+    """Значение ячейки -> float (Росстат иногда хранит числа строками с запятой)"""
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else float(value)
+    try:
+        return float(str(value).strip().replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def parse_workbook(path, since_year=None):
+    """Потоковый разбор листа Росстата
+
+    Возвращает pd.Series помесячных индексов (индекс — первое число месяца).
+    Если задан since_year, читаются только столбцы с годами >= since_year.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb[SHEET].iter_rows(values_only=True)
+        years = None
+        for row in rows:
+            if row and len(row) > 1 and isinstance(row[1], int):
+                years = [y for y in row[1:] if isinstance(y, int)]
+                break
+        if years is None:
+            raise ValueError(f'{path}: не найдена строка с годами на листе {SHEET}')
+
+        first = 0 if since_year is None else next(
+            (i for i, y in enumerate(years) if y >= since_year), len(years))
+        values = {}
+        for row in rows:
+            label = str(row[0]).strip().lower() if row and row[0] else ''
+            if label == SECTION_END:
+                break
+            if label not in MONTHS:
+                continue
+            month = MONTHS.index(label) + 1
+            for year, cell in zip(years[first:], row[1 + first:1 + len(years)]):
+                value = _to_float(cell)
+                if value is not None:
+                    values[pd.Timestamp(year=year, month=month, day=1)] = value
+    finally:
+        wb.close()
+
+    series = pd.Series(values, dtype=float).sort_index()
+    series.index.name = 'date'
+    return series
+
+
+def _file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _check_contiguous(series):
+    expected = pd.date_range(series.index[0], periods=len(series), freq='MS')
+    if not series.index.equals(expected):
+        raise ValueError('В выгрузке есть пропуски месяцев')
+
+
+def ingest(xlsx_path, store_dir=STORE_DIR, csv_path=IPC_CSV):
+    """Загрузка книги в колоночный кэш; возвращает число добавленных месяцев"""
+    store_dir = Path(store_dir)
+    source = _file_hash(xlsx_path)
+    meta = read_store_meta(store_dir)
+    if meta is not None and source in meta['sources']:
+        return 0
+
+    data_file = store_dir / f'{COLUMN}.f64'
+    if meta is None:
+        parsed = parse_workbook(xlsx_path)
+        _check_contiguous(parsed)
+        meta = {'start': str(parsed.index[0].date()), 'n': 0, 'columns': [COLUMN],
+                'revision': 0, 'sources': []}
+        kept = np.empty(0)
+    else:
+        last = pd.Timestamp(meta['start']) + pd.DateOffset(months=meta['n'] - 1)
+        parsed = parse_workbook(xlsx_path, since_year=last.year)
+        _check_contiguous(parsed)
+        if parsed.index[-1] < last:
+            raise ValueError(f'{xlsx_path}: выгрузка старше данных в кэше')
+
+        # Сверка пересекающихся месяцев: с первого пересмотренного
+        # (или с первого нового) месяца ряд заменяется значениями из книги
+        stored = read_store(store_dir, meta)[COLUMN]
+        overlap = stored.index.intersection(parsed.index)
+        changed = overlap[~np.isclose(stored[overlap].values, parsed[overlap].values)]
+        first_new = changed[0] if len(changed) else last + pd.DateOffset(months=1)
+        keep = stored.index.get_loc(first_new) if first_new <= last else meta['n']
+        kept = stored.values[:keep]
+        parsed = parsed[parsed.index >= first_new]
+
+    values = np.concatenate([kept, parsed.values]).astype('<f8')
+    added = len(values) - meta['n']
+    meta.update(n=len(values), revision=meta['revision'] + 1)
+    meta['sources'].append(source)
+
+    # CSV — первым: до записи meta.json его отметка не совпадает со старой,
+    # и читатели не обращаются к бинарному файлу, пока он заменяется
+    if csv_path:
+        index = pd.date_range(meta['start'], periods=len(values), freq='MS', name='date')
+        df = pd.DataFrame({COLUMN: values}, index=index)
+        write_atomic(csv_path, df.to_csv(date_format='%Y-%m-%d'))
+        meta['csv_stamp'] = file_stamp(csv_path)
+    write_atomic(data_file, values.tobytes())
+    write_atomic(store_dir / 'meta.json', json.dumps(meta, ensure_ascii=False, indent=2))
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Загрузка выгрузки Росстата в колоночный кэш')
+    parser.add_argument('xlsx', nargs='+', help='файлы ipc_mes_MM-YYYY.xlsx (по порядку выпусков)')
+    parser.add_argument('--csv', default=IPC_CSV, help='синхронизируемый CSV ("" — не писать)')
+    args = parser.parse_args()
+
+    for path in args.xlsx:
+        added = ingest(path, csv_path=args.csv or None)
+        print(f'{path}: добавлено месяцев: {added}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест дашборда: много одновременных сессий в одном процессе
+
+Каждая сессия — streamlit.testing AppTest с app.py (без браузера и
+сервера), все сессии делят кэши процесса (st.cache_data/cache_resource,
+кэш моделей, очередь обучений) — как пользователи одной реплики.
+Сессия открывает страницу и выполняет случайный сценарий действий
+пользователя: смена порядка SARIMA, горизонта, периода анализа,
+веерная диаграмма, переключатели вкладок, фильтры таблицы.
+
+Отчёт: p50/p95/p99 времени перезапуска скрипта по типам действий,
+пропускная способность, пиковая RSS (основной процесс и процессы
+обучения) и доля попаданий кэшей по счётчикам metrics.
+
+--cold — пустое хранилище моделей (день публикации: ни одной готовой MLE).
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import metrics
+
+ROOT = Path(__file__).resolve().parent
+
+# Действия сценария и их веса
+ACTIONS = {
+    'order': 3,
+    'horizon': 3,
+    'range': 2,
+    'fan': 2,
+    'history': 1,
+    'heatmap': 1,
+    'filter': 1,
+}
+BACKTEST_WEIGHT = 0.5
+
+PERCENTILES = (50, 95, 99)
+
+
+def _widget(at, kind, label=None, key=None):
+    """Виджет AppTest по подписи или ключу"""
+    for widget in getattr(at, kind):
+        if (key is not None and widget.key == key) or (label is not None and widget.label == label):
+            return widget
+    raise LookupError(f'{kind}: {label or key} не найден')
+
+
+def _act(at, action, rng):
+    """Изменение виджета для действия action (перезапуск — отдельно)"""
+    if action == 'order':
+        for key, values in (('p', (0, 1, 2)), ('q', (0, 1, 2)), ('P', (0, 1)), ('Q', (0, 1))):
+            _widget(at, 'number_input', key=key).set_value(rng.choice(values))
+    elif action == 'horizon':
+        _widget(at, 'slider', 'Горизонт прогноза (месяцев)').set_value(rng.randint(3, 36))
+    elif action == 'range':
+        start = datetime.date(rng.randint(1995, 2018), 1, 1)
+        end = _widget(at, 'date_input', 'Период анализа').value[1]
+        _widget(at, 'date_input', 'Период анализа').set_value((start, end))
+        _widget(at, 'checkbox', 'Обучать модель на выбранном периоде').set_value(rng.random() < 0.5)
+    elif action == 'fan':
+        toggle = _widget(at, 'toggle', 'Веерная диаграмма (Монте-Карло)')
+        toggle.set_value(not toggle.value)
+    elif action == 'history':
+        radio = _widget(at, 'radio', 'Выберите период:')
+        radio.set_value(rng.choice(radio.options))
+    elif action == 'heatmap':
+        radio = _widget(at, 'radio', key='heatmap_measure')
+        radio.set_value(rng.choice(radio.options))
+    elif action == 'filter':
+        years = _widget(at, 'multiselect', 'Фильтр по годам')
+        years.set_value(rng.sample(years.options, rng.randint(1, 5)))
+        _widget(at, 'text_input', '🔍 Поиск по значению ИПЦ (например: >105)').set_value(
+            rng.choice(['', '>101', '>105', '<100']))
+    elif action == 'backtest':
+        _widget(at, 'button', 'Запустить бэктест').click()
+
+
+def run_session(index, actions, think, weights, seed, timeout):
+    """Одна сессия: открытие страницы + actions действий; [(действие, мс, ошибка)]"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed * 100003 + index)
+    at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=timeout)
+    log = []
+    plan = ['open'] + rng.choices(list(weights), weights=list(weights.values()), k=actions)
+    for action in plan:
+        if action != 'open':
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+            try:
+                _act(at, action, rng)
+            except LookupError:
+                # Страница обрезана st.rerun() из фрагмента ожидания MLE —
+                # в браузере перезапуск шёл бы сам, здесь он отдельное действие
+                log.append(_timed_run(at, 'refresh'))
+                try:
+                    _act(at, action, rng)
+                except LookupError as e:
+                    log.append((action, None, str(e)))
+                    continue
+        log.append(_timed_run(at, action))
+    return log
+
+
+def _timed_run(at, action):
+    """Перезапуск скрипта сессии: (действие, мс, ошибка)"""
+    started = time.perf_counter()
+    try:
+        at.run()
+        error = '; '.join(str(e.value) for e in at.exception) or None
+    except Exception as e:   # таймаут перезапуска и т.п.
+        error = f'{type(e).__name__}: {e}'
+    return action, (time.perf_counter() - started) * 1000, error
+
+
+def _rss_mb(pid='self', field='VmHWM'):
+    """Пиковая (VmHWM) или текущая (VmRSS) резидентная память процесса, МБ"""
+    try:
+        for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        return None
+    return None
+
+
+def peak_rss():
+    """Пиковая RSS: основной процесс и живые дочерние (пул обучения), МБ"""
+    main_mb = _rss_mb() or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    workers = [mb for mb in (_rss_mb(p.pid) for p in multiprocessing.active_children()) if mb]
+    finished = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {'main_mb': round(main_mb, 1), 'workers_mb': [round(mb, 1) for mb in workers],
+            'finished_children_max_mb': round(finished, 1)}
+
+
+def cache_rates(counters):
+    """Попадания кэшей по счётчикам metrics: {кэш: {calls, hits, misses, evictions, hit_rate}}"""
+    rates = {}
+    for name in sorted({key.split('.')[1] for key in counters if key.startswith('cache.')}):
+        calls = counters.get(f'cache.{name}.calls', 0)
+        misses = counters.get(f'cache.{name}.misses', 0)
+        rates[name] = {'calls': calls, 'hits': calls - misses, 'misses': misses,
+                       'evictions': counters.get(f'cache.{name}.evictions', 0)}
+    for name, hit, miss in (('model_store', 'model_store.hit', 'model_store.miss'),
+                            ('diagnostics', 'diagnostics.hit', 'diagnostics.miss')):
+        hits, misses = counters.get(hit, 0), counters.get(miss, 0)
+        rates[name] = {'calls': hits + misses, 'hits': hits, 'misses': misses, 'evictions': 0}
+    for row in rates.values():
+        row['hit_rate'] = round(row['hits'] / row['calls'], 3) if row['calls'] else None
+    return rates
+
+
+def summarize(logs, wall):
+    """Перцентили задержки по действиям и пропускная способность"""
+    by_action = {}
+    for action, ms, _ in (entry for log in logs for entry in log):
+        if ms is not None:
+            by_action.setdefault(action, []).append(ms)
+    by_action['все'] = [ms for values in list(by_action.values()) for ms in values]
+
+    latency = {}
+    for action, values in by_action.items():
+        if not values:
+            continue
+        p = np.percentile(values, PERCENTILES)
+        latency[action] = {'n': len(values), **{f'p{q}': round(float(v), 1) for q, v in zip(PERCENTILES, p)},
+                           'max': round(max(values), 1)}
+    errors = [(action, error) for log in logs for action, _, error in log if error]
+    return {
+        'wall_s': round(wall, 2),
+        'reruns': latency.get('все', {}).get('n', 0),
+        'throughput_rps': round(latency.get('все', {}).get('n', 0) / wall, 2) if wall else None,
+        'errors': len(errors),
+        'error_samples': sorted({error for _, error in errors})[:5],
+        'latency_ms': latency,
+    }
+
+
+def load_test(sessions, concurrency, actions, think=0.0, ramp=0.0, seed=0, backtest=False, timeout=600):
+    """Запуск нагрузки; отчёт (см. summarize) + память и кэши"""
+    weights = dict(ACTIONS, **({'backtest': BACKTEST_WEIGHT} if backtest else {}))
+    # Счётчики — в памяти, без JSON-лога каждой стадии
+    if not metrics.logger.handlers:
+        metrics.logger.addHandler(logging.NullHandler())
+    metrics.enable()
+    before = metrics.snapshot()['counters']
+
+    def start(index):
+        if ramp:
+            time.sleep(ramp * index / sessions)
+        return run_session(index, actions, think, weights, seed, timeout)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        logs = list(pool.map(start, range(sessions)))
+    report = summarize(logs, time.perf_counter() - started)
+
+    counters = metrics.snapshot()['counters']
+    report['config'] = {'sessions': sessions, 'concurrency': concurrency, 'actions': actions,
+                        'think_s': think, 'ramp_s': ramp, 'seed': seed, 'backtest': backtest,
+                        'cpu_count': os.cpu_count()}
+    report['rss'] = peak_rss()
+    report['caches'] = cache_rates({k: v - before.get(k, 0) for k, v in counters.items()})
+    report['fitqueue'] = {k.split('.', 1)[1]: v - before.get(k, 0)
+                          for k, v in counters.items() if k.startswith('fitqueue.')}
+    return report
+
+
+def print_report(report):
+    config = report['config']
+    print(f"Сессий: {config['sessions']} (одновременно {config['concurrency']}), "
+          f"действий на сессию: {config['actions']}, перезапусков: {report['reruns']}, "
+          f"ошибок: {report['errors']}")
+    print(f"Время: {report['wall_s']} с, пропускная способность: {report['throughput_rps']} перезапусков/с")
+
+    print(f"\n{'Задержка перезапуска, мс':<26}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for action, row in report['latency_ms'].items():
+        print(f"  {action:<24}{row['n']:>6}{row['p50']:>10.1f}{row['p95']:>10.1f}"
+              f"{row['p99']:>10.1f}{row['max']:>10.1f}")
+
+    rss = report['rss']
+    workers = ', '.join(f'{mb:.0f}' for mb in rss['workers_mb']) or '—'
+    print(f"\nПиковая RSS: основной процесс {rss['main_mb']:.0f} МБ, процессы обучения: {workers} МБ")
+
+    print(f"\n{'Кэш':<22}{'обращений':>11}{'попаданий':>11}{'вытеснений':>12}{'доля':>8}")
+    for name, row in report['caches'].items():
+        rate = f"{row['hit_rate']:.0%}" if row['hit_rate'] is not None else '—'
+        print(f"  {name:<20}{row['calls']:>11}{row['hits']:>11}{row['evictions']:>12}{rate:>8}")
+    if report['fitqueue']:
+        print('\nОчередь обучений: ' + ', '.join(f'{k}={v}' for k, v in sorted(report['fitqueue'].items())))
+    for error in report['error_samples']:
+        print(f'Ошибка: {error}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест дашборда (сессии AppTest)')
+    parser.add_argument('--sessions', type=int, default=20, help='всего сессий')
+    parser.add_argument('--concurrency', type=int, default=8, help='одновременных сессий')
+    parser.add_argument('--actions', type=int, default=10, help='действий в сценарии сессии')
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='среднее время между действиями, с (экспоненциальное)')
+    parser.add_argument('--ramp', type=float, default=0.0, help='растянуть старт сессий на столько секунд')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backtest', action='store_true', help='добавить в сценарии запуск бэктеста')
+    parser.add_argument('--cold', action='store_true',
+                        help='пустое хранилище моделей (временный IPC_MODEL_DIR)')
+    parser.add_argument('--timeout', type=float, default=600, help='предел одного перезапуска, с')
+    parser.add_argument('--json', type=Path, help='сохранить отчёт в файл')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.cold:
+        # До импорта model_store (app.py): путь читается при импорте, пул обучения наследует окружение
+        os.environ['IPC_MODEL_DIR'] = tempfile.mkdtemp(prefix='ipc-models-')
+    # Предупреждения streamlit на каждый перезапуск (устаревшие параметры,
+    # кэш вне ScriptRunContext в потоках сессий) — не в отчёт
+    from streamlit.logger import get_logger
+    for name in ('streamlit.deprecation_util', 'streamlit.runtime.scriptrunner_utils.script_run_context'):
+        get_logger(name).disabled = True
+    # ConvergenceWarning statsmodels — здесь и в процессах пула обучения.
+    # Предупреждения streamlit из пула (он импортирует app.py как __main__)
+    # остаются в stderr; отчёт — в stdout
+    os.environ.setdefault('PYTHONWARNINGS', 'ignore')
+    warnings.simplefilter('ignore')
+
+    report = load_test(args.sessions, args.concurrency, args.actions, args.think, args.ramp,
+                       args.seed, args.backtest, args.timeout)
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    return 1 if report['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
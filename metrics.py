@@ -0,0 +1,154 @@
+"""
+Инструментирование горячих путей: время стадий, счётчики, значения
+
+По умолчанию выключено (включается IPC_METRICS=1 или metrics.enable()).
+В выключенном состоянии stage() возвращает общий пустой контекст,
+а count()/observe() сразу выходят — накладные расходы на уровне
+одного вызова функции. Во включённом каждая стадия пишет JSON-строку
+в логгер ipc.metrics, агрегаты доступны через snapshot() (панель
+отладки дашборда) и prometheus() (эндпоинт /api/metrics).
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger('ipc.metrics')
+
+_enabled = False
+_lock = threading.Lock()
+_NULL = nullcontext()
+
+# Агрегаты: имя -> [число, сумма, максимум, последнее]
+_stages = {}
+_values = {}
+_counters = {}
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    """Включение сбора метрик (и JSON-логов в stderr, если логгер не настроен)"""
+    global _enabled
+    _enabled = on
+    if on and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def _add(table, name, value):
+    with _lock:
+        agg = table.get(name)
+        if agg is None:
+            table[name] = [1, value, value, value]
+        else:
+            agg[0] += 1
+            agg[1] += value
+            agg[2] = max(agg[2], value)
+            agg[3] = value
+
+
+def count(name, n=1):
+    """Счётчик событий (попадания/промахи кэша, вытеснения)"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name, value):
+    """Значение величины (итерации оптимизатора, размер графика в байтах)"""
+    if not _enabled:
+        return
+    _add(_values, name, value)
+
+
+def stage(name, **fields):
+    """Замер времени стадии: with metrics.stage('fit.optimize') as info: ...
+
+    info — словарь полей JSON-лога (None, если метрики выключены).
+    """
+    if not _enabled:
+        return _NULL
+    return _timed(name, fields)
+
+
+@contextmanager
+def _timed(name, fields):
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        elapsed = time.perf_counter() - started
+        _add(_stages, name, elapsed)
+        logger.info(json.dumps({'ts': round(time.time(), 3), 'pid': os.getpid(), 'stage': name,
+                                'ms': round(elapsed * 1000, 3), **fields},
+                               ensure_ascii=False, default=str))
+
+
+def snapshot():
+    """Агрегаты процесса: стадии (мс), значения и счётчики"""
+    with _lock:
+        stages = {name: {'count': n, 'total_ms': total * 1000, 'mean_ms': total / n * 1000,
+                         'max_ms': top * 1000, 'last_ms': last * 1000}
+                  for name, (n, total, top, last) in _stages.items()}
+        values = {name: {'count': n, 'mean': total / n, 'max': top, 'last': last}
+                  for name, (n, total, top, last) in _values.items()}
+        return {'stages': stages, 'values': values, 'counters': dict(_counters)}
+
+
+def drain():
+    """Сырые агрегаты со сбросом — для передачи из процесса пула (None, если выключено)"""
+    if not _enabled:
+        return None
+    global _stages, _values, _counters
+    with _lock:
+        raw = {'stages': _stages, 'values': _values, 'counters': _counters}
+        _stages, _values, _counters = {}, {}, {}
+    return raw
+
+
+def merge(raw):
+    """Добавление агрегатов, полученных через drain() в другом процессе"""
+    if not raw:
+        return
+    with _lock:
+        for table, incoming in ((_stages, raw['stages']), (_values, raw['values'])):
+            for name, (n, total, top, last) in incoming.items():
+                agg = table.setdefault(name, [0, 0.0, top, last])
+                agg[0] += n
+                agg[1] += total
+                agg[2] = max(agg[2], top)
+                agg[3] = last
+        for name, n in raw['counters'].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def prometheus():
+    """Агрегаты в текстовом формате Prometheus"""
+    lines = []
+    with _lock:
+        for name, (n, total, top, _) in sorted(_stages.items()):
+            lines += [f'ipc_stage_seconds_count{{stage="{name}"}} {n}',
+                      f'ipc_stage_seconds_sum{{stage="{name}"}} {total:.6f}',
+                      f'ipc_stage_seconds_max{{stage="{name}"}} {top:.6f}']
+        for name, (n, total, top, _) in sorted(_values.items()):
+            lines += [f'ipc_value_count{{name="{name}"}} {n}',
+                      f'ipc_value_sum{{name="{name}"}} {total:g}',
+                      f'ipc_value_max{{name="{name}"}} {top:g}']
+        for name, n in sorted(_counters.items()):
+            lines.append(f'ipc_events_total{{name="{name}"}} {n}')
+    return '\n'.join(lines) + '\n'
+
+
+if os.environ.get('IPC_METRICS') == '1':
+    enable()
@@ -0,0 +1,67 @@
+"""
+Кэш обученных моделей в памяти процесса с ограничением по объёму
+
+Хранит CompactModel (modeling.compact_model) по ключу модели без
+горизонта прогноза; прогноз любой длины считается из записи по запросу.
+При превышении бюджета вытесняются давно не использованные записи (LRU).
+Бюджет — IPC_MODEL_CACHE_MB мегабайт (по умолчанию 64).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+DEFAULT_BUDGET_MB = 64
+
+
+class ModelCache:
+    def __init__(self, budget_bytes=None, name='models'):
+        if budget_bytes is None:
+            budget_bytes = float(os.environ.get('IPC_MODEL_CACHE_MB', DEFAULT_BUDGET_MB)) * 2**20
+        self.budget_bytes = int(budget_bytes)
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (model, байт), в конце — недавние
+        self.nbytes = 0
+
+    def get(self, key):
+        """Модель по ключу (None при промахе); запись становится самой свежей"""
+        metrics.count(f'cache.{self.name}.calls')
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.count(f'cache.{self.name}.misses')
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, model):
+        """Добавление модели с вытеснением старых записей сверх бюджета; возвращает model"""
+        size = model.nbytes
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (model, size)
+            self.nbytes += size
+            # Последняя запись остаётся, даже если одна больше бюджета
+            while self.nbytes > self.budget_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                metrics.count(f'cache.{self.name}.evictions')
+            metrics.observe(f'cache.{self.name}.bytes', self.nbytes)
+        return model
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def status(self):
+        """Заполнение кэша: {'entries': n, 'bytes': n, 'budget_bytes': n}"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'budget_bytes': self.budget_bytes}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,243 @@
+"""
+Персистентное хранилище обученных SARIMA моделей на локальном диске
+
+Ключ модели — хэш содержимого ряда + order/seasonal_order.
+Хранятся только оценённые параметры: по ним модель восстанавливается
+одним проходом фильтра Калмана без повторной оптимизации.
+
+Хранилище общее для нескольких процессов (пул обучения дашборда, API,
+пакетное обучение индикаторов): чтение-изменение-запись записей модели
+и индекса окон идёт под файловой блокировкой (fcntl.flock).
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MODEL_DIR = Path(os.environ.get('IPC_MODEL_DIR', 'cache/models'))
+
+
+def data_hash(data):
+    """Хэш содержимого ряда (значения + даты)"""
+    hashed = pd.util.hash_pandas_object(data, index=True).values
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+
+def order_key(order, seasonal_order):
+    """Строковый ключ порядка модели, например 1-0-1_1-0-1-12"""
+    return '-'.join(map(str, order)) + '_' + '-'.join(map(str, seasonal_order))
+
+
+def parse_order_key(key):
+    """Обратное преобразование order_key -> (order, seasonal_order)"""
+    left, right = key.split('_')
+    order = tuple(int(v) for v in left.split('-'))
+    seasonal_order = tuple(int(v) for v in right.split('-'))
+    return order, seasonal_order
+
+
+def _entry_path(dhash, order, seasonal_order):
+    return MODEL_DIR / dhash / f'{order_key(order, seasonal_order)}.json'
+
+
+def _write_atomic(path, payload):
+    """Атомарная запись JSON: временный файл + os.replace"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def _locked(path):
+    """Исключительная межпроцессная блокировка файла path (рядом — <имя>.lock)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_params(dhash, order, seasonal_order):
+    """Загрузка сохранённых параметров модели (None, если модели нет)"""
+    path = _entry_path(dhash, order, seasonal_order)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_params(dhash, order, seasonal_order, model_fit):
+    """Сохранение параметров обученной модели"""
+    retvals = model_fit.mle_retvals or {}
+    payload = {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'param_names': list(model_fit.model.param_names),
+        'params': np.asarray(model_fit.params, dtype=float).tolist(),
+        'aic': float(model_fit.aic),
+        'bic': float(model_fit.bic),
+        'llf': float(model_fit.llf),
+        'nobs': int(model_fit.nobs),
+        'iterations': int(retvals.get('iterations', 0)),
+        'fcalls': int(retvals.get('fcalls', 0)),
+        'converged': bool(retvals.get('converged', False)),
+    }
+    path = _entry_path(dhash, order, seasonal_order)
+    with _locked(path):
+        _write_atomic(path, payload)
+    return payload
+
+
+def save_extended(dhash, order, seasonal_order, base, base_hash, months, llf, nobs, nobs_effective):
+    """Сохранение модели, продлённой новыми наблюдениями без переоценки
+
+    Параметры — из записи base (модель на предыдущей версии ряда base_hash),
+    llf/AIC/BIC — для удлинённого ряда. extended_months — сколько месяцев
+    модель живёт без переоценки (сумма по цепочке продлений).
+    """
+    k = len(base['params'])
+    payload = {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'param_names': base['param_names'],
+        'params': base['params'],
+        'aic': -2 * llf + 2 * k,
+        'bic': -2 * llf + k * float(np.log(nobs_effective)),
+        'llf': llf,
+        'nobs': int(nobs),
+        'iterations': 0,
+        'fcalls': 0,
+        'converged': base.get('converged', False),
+        'extended_from': base_hash,
+        'extended_months': int(base.get('extended_months', 0)) + months,
+    }
+    path = _entry_path(dhash, order, seasonal_order)
+    with _locked(path):
+        _write_atomic(path, payload)
+    return payload
+
+
+def save_diagnostics(dhash, order, seasonal_order, diagnostics):
+    """Добавление диагностики остатков к сохранённой модели
+
+    diagnostics['params'] — параметры модели, по которой она посчитана.
+    False (без записи), если модели нет или запись уже с другими
+    параметрами (например, точная MLE заменила её после расчёта).
+    """
+    path = _entry_path(dhash, order, seasonal_order)
+    with _locked(path):
+        entry = load_params(dhash, order, seasonal_order)
+        if entry is None or not np.allclose(entry['params'], diagnostics['params']):
+            return False
+        entry['diagnostics'] = diagnostics
+        _write_atomic(path, entry)
+    return True
+
+
+def fitted_orders(dhash):
+    """Все порядки, уже обученные на данном ряде"""
+    folder = MODEL_DIR / dhash
+    if not folder.is_dir():
+        return []
+    return [parse_order_key(path.stem) for path in folder.glob('*.json')]
+
+
+def _order_distance(a, b):
+    """Расстояние между порядками: L1 по (p,d,q,P,D,Q) + штраф за другой s"""
+    (order_a, seasonal_a), (order_b, seasonal_b) = a, b
+    dist = sum(abs(x - y) for x, y in zip(order_a + seasonal_a[:3], order_b + seasonal_b[:3]))
+    return dist + (seasonal_a[3] != seasonal_b[3])
+
+
+def nearest_params(dhash, order, seasonal_order):
+    """Параметры ближайшей уже обученной модели (для тёплого старта)"""
+    target = (tuple(order), tuple(seasonal_order))
+    candidates = [c for c in fitted_orders(dhash) if c != target]
+    if not candidates:
+        return None
+    nearest = min(candidates, key=lambda c: _order_distance(c, target))
+    return load_params(dhash, *nearest)
+
+
+def warm_start_params(model, stored):
+    """Стартовые значения для model.fit по параметрам соседней модели
+
+    Параметры с совпадающими именами (ar.L1, ma.S.L12, sigma2, ...)
+    берутся из соседней модели, остальные — стандартные start_params.
+    """
+    start = np.array(model.start_params, dtype=float)
+    if stored is None:
+        return start
+    known = dict(zip(stored['param_names'], stored['params']))
+    for i, name in enumerate(model.param_names):
+        if name in known and np.isfinite(known[name]):
+            start[i] = known[name]
+    return start
+
+
+def load_leaderboard(dhash, grid_key):
+    """Сохранённый рейтинг автоподбора порядка (None, если нет)"""
+    path = MODEL_DIR / dhash / 'search' / f'{grid_key}.json'
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_leaderboard(dhash, grid_key, leaderboard):
+    """Сохранение рейтинга автоподбора порядка"""
+    _write_atomic(MODEL_DIR / dhash / 'search' / f'{grid_key}.json', leaderboard)
+
+
+def _windows_path(source):
+    return MODEL_DIR / 'windows' / f'{source}.json'
+
+
+def register_window(source, dhash, start, end):
+    """Запись окна [start, end] ряда source в индекс окон"""
+    path = _windows_path(source)
+    with _locked(path):
+        windows = registered_windows(source)
+        if windows.get(dhash) != [start, end]:
+            windows[dhash] = [start, end]
+            _write_atomic(path, windows)
+
+
+def registered_windows(source):
+    """Окна ряда source: {хэш окна: [начало, конец]}"""
+    try:
+        with open(_windows_path(source), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def overlapping_params(source, start, end, order, seasonal_order):
+    """Параметры той же модели на окне с наибольшим пересечением с [start, end]"""
+    windows = registered_windows(source)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    best, best_overlap = None, pd.Timedelta(0)
+    for dhash, (w_start, w_end) in windows.items():
+        overlap = min(end, pd.Timestamp(w_end)) - max(start, pd.Timestamp(w_start))
+        if overlap > best_overlap:
+            stored = load_params(dhash, order, seasonal_order)
+            if stored is not None:
+                best, best_overlap = stored, overlap
+    return best
@@ -0,0 +1,356 @@
+"""
+Обучение SARIMA моделей с использованием персистентного хранилища
+"""
+
+import warnings
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import model_store
+
+warnings.filterwarnings('ignore')
+
+
+def build_model(data, order, seasonal_order):
+    """SARIMAX модель с настройками дашборда"""
+    # statsmodels импортируется лениво: ~1.5 с на холодном старте
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    return SARIMAX(data,
+                   order=order,
+                   seasonal_order=seasonal_order,
+                   enforce_stationarity=False,
+                   enforce_invertibility=False)
+
+
+def fit_sarima(data, order, seasonal_order, warm_start=None):
+    """Обучение SARIMA модели
+
+    Если модель с таким ключом уже есть на диске — параметры
+    восстанавливаются без оптимизации. Иначе оптимизатор стартует
+    с параметров warm_start (сохранённая запись model_store), а если
+    их нет — с параметров ближайшего уже обученного порядка.
+    """
+    order, seasonal_order = tuple(order), tuple(seasonal_order)
+    dhash = model_store.data_hash(data)
+    with metrics.stage('fit.build'):
+        model = build_model(data, order, seasonal_order)
+
+    stored = model_store.load_params(dhash, order, seasonal_order)
+    if stored is not None and stored['param_names'] == list(model.param_names):
+        metrics.count('model_store.hit')
+        with metrics.stage('fit.restore', nobs=model.nobs):
+            return model.filter(np.asarray(stored['params']))
+    metrics.count('model_store.miss')
+
+    if warm_start is None:
+        warm_start = model_store.nearest_params(dhash, order, seasonal_order)
+    start_params = model_store.warm_start_params(model, warm_start)
+    with metrics.stage('fit.optimize', nobs=model.nobs, warm=warm_start is not None) as info:
+        model_fit = model.fit(start_params=start_params, disp=False)
+        if info is not None:
+            retvals = model_fit.mle_retvals or {}
+            info.update(iterations=retvals.get('iterations'), fcalls=retvals.get('fcalls'),
+                        converged=retvals.get('converged'))
+            metrics.observe('fit.iterations', retvals.get('iterations', 0))
+            metrics.observe('fit.fcalls', retvals.get('fcalls', 0))
+    model_store.save_params(dhash, order, seasonal_order, model_fit)
+    return model_fit
+
+
+def fit_sarima_window(data, start, end, order, seasonal_order):
+    """Обучение SARIMA на окне [start, end] ряда data
+
+    Модели кэшируются по окну (хэш среза + порядок). Новое окно
+    стартует с параметров той же модели на сильнее всего
+    пересекающемся окне этого ряда.
+    """
+    start, end = str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date())
+    window = data[start:end]
+    source = model_store.data_hash(data)
+    model_store.register_window(source, model_store.data_hash(window), start, end)
+    warm_start = model_store.overlapping_params(source, start, end, order, seasonal_order)
+    return fit_sarima(window, order, seasonal_order, warm_start=warm_start)
+
+
+def has_exact_fit(data, start, end, order, seasonal_order):
+    """Есть ли в model_store точная MLE модели на окне [start, end]"""
+    window = data[str(pd.Timestamp(start).date()):str(pd.Timestamp(end).date())]
+    return model_store.load_params(model_store.data_hash(window), order, seasonal_order) is not None
+
+
+# Источник стартовых параметров предварительной оценки
+PREVIEW_OVERLAP = 'overlap'     # та же модель на пересекающемся окне
+PREVIEW_NEAREST = 'nearest'     # ближайший обученный порядок на том же ряде
+PREVIEW_CSS = 'css'             # start_params SARIMAX (условная сумма квадратов)
+
+
+def preview_sarima_window(data, start, end, order, seasonal_order):
+    """Быстрая предварительная оценка SARIMA на окне [start, end] без оптимизации
+
+    Параметры берутся у той же модели на сильнее всего пересекающемся
+    окне, иначе у ближайшего обученного порядка, иначе — CSS-оценки
+    (start_params SARIMAX, условная сумма квадратов). Затем один проход
+    фильтра Калмана: десятки миллисекунд вместо секунд MLE.
+    Возвращает (результат, источник параметров: PREVIEW_*).
+    """
+    start, end = str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date())
+    window = data[start:end]
+    model = build_model(window, order, seasonal_order)
+    source = PREVIEW_OVERLAP
+    stored = model_store.overlapping_params(model_store.data_hash(data), start, end, order, seasonal_order)
+    if stored is None:
+        source = PREVIEW_NEAREST
+        stored = model_store.nearest_params(model_store.data_hash(window), order, seasonal_order)
+    if stored is None:
+        source = PREVIEW_CSS
+    with metrics.stage('fit.preview', nobs=model.nobs, source=source):
+        return model.filter(model_store.warm_start_params(model, stored)), source
+
+
+def fit_window_to_store(data, start, end, order, seasonal_order):
+    """Точная MLE на окне с сохранением в model_store (для фоновых процессов)
+
+    Возвращает только AIC: модель забирается из model_store, а не
+    пересылается между процессами.
+    """
+    return float(fit_sarima_window(data, start, end, order, seasonal_order).aic)
+
+
+def extend_sarima(data, new_months, order, seasonal_order, base, base_hash):
+    """Продление модели новыми наблюдениями без переоценки параметров
+
+    data — ряд с new_months новыми месяцами в конце, base — запись
+    model_store той же модели на data без них (base_hash — её ключ).
+    Параметры восстанавливаются на старом ряде, затем фильтр Калмана
+    проходит только по новым месяцам от конечного состояния
+    (results.extend). Результат сохраняется в model_store под хэшем
+    data — дальше модель восстанавливается как обычная обученная.
+    """
+    order, seasonal_order = tuple(order), tuple(seasonal_order)
+    old, new = data.iloc[:-new_months], data.iloc[-new_months:]
+    with metrics.stage('fit.restore', nobs=len(old)):
+        model_fit = build_model(old, order, seasonal_order).filter(np.asarray(base['params']))
+    with metrics.stage('fit.extend', months=new_months):
+        extended = model_fit.extend(new)
+    llf = float(model_fit.llf + np.sum(extended.llf_obs))
+    model_store.save_extended(model_store.data_hash(data), order, seasonal_order, base, base_hash,
+                              new_months, llf, len(data), len(data) - model_fit.loglikelihood_burn)
+    return extended
+
+
+def forecast_sarima(model_fit, forecast_steps, alpha=0.05):
+    """Прогноз на forecast_steps шагов и доверительный интервал"""
+    with metrics.stage('forecast', steps=forecast_steps):
+        forecast_result = model_fit.get_forecast(steps=forecast_steps)
+        forecast = forecast_result.predicted_mean
+        conf_int = forecast_result.conf_int(alpha=alpha)
+    return forecast, conf_int
+
+
+@dataclass(eq=False)
+class CompactModel:
+    """Компактное представление обученной SARIMA
+
+    Только то, что нужно дашборду после обучения: параметры, матрицы
+    пространства состояний, прогнозное состояние после последнего
+    наблюдения с его ковариацией и остатки. Десятки килобайт вместо
+    мегабайт SARIMAXResults (сглаживание, копии данных, модель).
+    Прогноз на любой горизонт считается из состояния по запросу.
+    """
+    order: tuple
+    seasonal_order: tuple
+    dhash: str                  # хэш ряда обучения — ключ model_store
+    params: np.ndarray
+    aic: float
+    bic: float
+    model_df: int               # число ARMA-параметров (степени свободы теста Льюнга–Бокса)
+    freq: str
+    design: np.ndarray
+    obs_intercept: np.ndarray
+    obs_cov: np.ndarray
+    transition: np.ndarray
+    state_intercept: np.ndarray
+    selection: np.ndarray
+    state_cov: np.ndarray
+    end_state: np.ndarray       # a(n+1 | n)
+    end_state_cov: np.ndarray   # P(n+1 | n)
+    resid: pd.Series
+    start_source: str = None    # для предварительной оценки — откуда параметры (PREVIEW_*)
+
+    @property
+    def nbytes(self):
+        """Примерный объём в памяти, байт"""
+        arrays = sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+        return arrays + self.resid.memory_usage(index=True, deep=False) + 1024
+
+    def forecast(self, steps, alpha=0.05):
+        """Прогноз и доверительный интервал — как forecast_sarima для исходной модели"""
+        with metrics.stage('forecast.compact', steps=steps):
+            shocks = self.selection @ self.state_cov @ self.selection.T
+            state, state_cov = self.end_state, self.end_state_cov
+            mean, var = np.empty(steps), np.empty(steps)
+            for t in range(steps):
+                mean[t] = (self.obs_intercept + self.design @ state)[0]
+                var[t] = (self.design @ state_cov @ self.design.T + self.obs_cov)[0, 0]
+                state = self.state_intercept + self.transition @ state
+                state_cov = self.transition @ state_cov @ self.transition.T + shocks
+            index = pd.date_range(self.resid.index[-1], periods=steps + 1, freq=self.freq)[1:]
+            z = NormalDist().inv_cdf(1 - alpha / 2)
+            half = z * np.sqrt(var)
+            name = self.resid.name
+            forecast = pd.Series(mean, index=index, name='predicted_mean')
+            conf_int = pd.DataFrame({f'lower {name}': mean - half, f'upper {name}': mean + half}, index=index)
+        return forecast, conf_int
+
+
+def compact_model(model_fit, start_source=None):
+    """CompactModel из результата SARIMAX (матрицы модели не зависят от времени)"""
+    model = model_fit.model
+    ssm = model_fit.filter_results
+    return CompactModel(
+        order=tuple(model.order),
+        seasonal_order=tuple(model.seasonal_order),
+        dhash=model_store.data_hash(model.data.orig_endog),
+        params=np.asarray(model_fit.params, dtype=float),
+        aic=float(model_fit.aic),
+        bic=float(model_fit.bic),
+        model_df=(model.k_ar_params + model.k_ma_params
+                  + model.k_seasonal_ar_params + model.k_seasonal_ma_params),
+        freq=model._index.freqstr,
+        design=ssm.design[..., -1].copy(),
+        obs_intercept=ssm.obs_intercept[:, -1].copy(),
+        obs_cov=ssm.obs_cov[..., -1].copy(),
+        transition=ssm.transition[..., -1].copy(),
+        state_intercept=ssm.state_intercept[:, -1].copy(),
+        selection=ssm.selection[..., -1].copy(),
+        state_cov=ssm.state_cov[..., -1].copy(),
+        end_state=ssm.predicted_state[:, -1].copy(),
+        end_state_cov=ssm.predicted_state_cov[..., -1].copy(),
+        resid=model_fit.resid.rename(model.endog_names),
+        start_source=start_source,
+    )
+
+
+# Уровни квантилей веерной диаграммы: 1%, 2%, ..., 99%
+FAN_LEVELS = np.arange(1, 100) / 100
+
+
+def _psd_sqrt(matrix):
+    """Матричный корень S (S @ S.T = matrix) для неотрицательно определённой матрицы"""
+    values, vectors = np.linalg.eigh(matrix)
+    return vectors * np.sqrt(np.clip(values, 0, None))
+
+
+def simulate_paths(model, steps, repetitions=5000, seed=0):
+    """Монте-Карло траектории прогноза CompactModel, массив steps × repetitions
+
+    Траектории стартуют из прогнозного состояния после последнего
+    наблюдения (как simulate(anchor='end')), но считаются все сразу:
+    цикл только по шагам, на каждом шаге — одно матричное умножение
+    на все траектории. simulate(repetitions=N) в statsmodels
+    перебирает траектории в цикле Python.
+    """
+    design = model.design
+    obs_intercept = model.obs_intercept[:, None]
+    transition = model.transition
+    state_intercept = model.state_intercept[:, None]
+    shocks = model.selection @ _psd_sqrt(model.state_cov)
+    obs_noise = _psd_sqrt(model.obs_cov)
+
+    rng = np.random.default_rng(seed)
+    k_states = transition.shape[0]
+    states = (model.end_state[:, None]
+              + _psd_sqrt(model.end_state_cov) @ rng.standard_normal((k_states, repetitions)))
+    paths = np.empty((steps, repetitions))
+    for t in range(steps):
+        observed = obs_intercept + design @ states + obs_noise @ rng.standard_normal((1, repetitions))
+        paths[t] = observed[0]
+        states = state_intercept + transition @ states + shocks @ rng.standard_normal((shocks.shape[1], repetitions))
+    return paths
+
+
+def fan_quantiles(paths):
+    """Квантили FAN_LEVELS по траекториям: массив steps × len(FAN_LEVELS)"""
+    return np.quantile(paths, FAN_LEVELS, axis=1).T
+
+
+def exceed_probability(quantiles, threshold):
+    """P(значение > threshold) на каждом шаге по матрице квантилей
+
+    Точность — 1 п.п.; за пределами 1–99% квантилей вероятность
+    ограничивается 0 и 1.
+    """
+    return np.array([1 - np.interp(threshold, row, FAN_LEVELS, left=0.0, right=1.0)
+                     for row in quantiles])
+
+
+def ljung_box(acf_values, nobs, model_df=0):
+    """Тест Льюнга–Бокса сразу для всех лагов 1..len(acf_values)-1
+
+    Статистики всех лагов — накопленная сумма по уже посчитанной ACF,
+    без отдельного вызова на каждый лаг.
+    """
+    from scipy.stats import chi2
+
+    lags = np.arange(1, len(acf_values))
+    r = np.asarray(acf_values)[1:]
+    stat = nobs * (nobs + 2) * np.cumsum(r ** 2 / (nobs - lags))
+    dof = lags - model_df
+    pvalue = np.where(dof > 0, chi2.sf(stat, np.maximum(dof, 1)), np.nan)
+    return {'lags': lags.tolist(), 'stat': stat.tolist(),
+            'pvalue': [None if np.isnan(p) else float(p) for p in pvalue]}
+
+
+def residual_diagnostics(model, nlags=40, save=True):
+    """Диагностика остатков CompactModel: ACF (FFT), PACF, Льюнг–Бокс, Q-Q и сводка
+
+    Считается один раз на модель и сохраняется вместе с её параметрами
+    в model_store; повторный вызов для той же модели читает готовый набор.
+    Набор помечен параметрами, по которым посчитан: для модели с другими
+    параметрами (предварительная оценка, переобученная запись) он не
+    используется и не записывается. save=False — не сохранять (предварительная оценка).
+    """
+    from scipy import stats
+    from statsmodels.tsa.stattools import acf, pacf
+
+    entry = model_store.load_params(model.dhash, model.order, model.seasonal_order)
+    cached = entry.get('diagnostics') if entry else None
+    if (cached is not None and cached.get('nlags') == nlags
+            and _same_params(cached.get('params'), model.params)):
+        metrics.count('diagnostics.hit')
+        return cached
+    metrics.count('diagnostics.miss')
+
+    residuals = model.resid.to_numpy()
+    with metrics.stage('diag.acf'):
+        acf_values = acf(residuals, nlags=nlags, fft=True)
+    with metrics.stage('diag.pacf'):
+        pacf_values = pacf(residuals, nlags=nlags)
+    with metrics.stage('diag.probplot'):
+        (osm, osr), (slope, intercept, _) = stats.probplot(residuals, dist="norm")
+    diagnostics = {
+        'nlags': nlags,
+        'params': np.asarray(model.params, dtype=float).tolist(),
+        'aic': model.aic,
+        'bic': model.bic,
+        'resid_mean': float(residuals.mean()),
+        'resid_std': float(residuals.std(ddof=1)),
+        'conf_bound': float(1.96 / np.sqrt(len(residuals))),
+        'acf': acf_values.tolist(),
+        'pacf': pacf_values.tolist(),
+        'ljung_box': ljung_box(acf_values, len(residuals), model.model_df),
+        'qq': {'osm': osm.tolist(), 'osr': osr.tolist(),
+               'slope': float(slope), 'intercept': float(intercept)},
+    }
+    if save:
+        model_store.save_diagnostics(model.dhash, model.order, model.seasonal_order, diagnostics)
+    return diagnostics
+
+
+def _same_params(stored, params):
+    return stored is not None and len(stored) == len(params) and np.allclose(stored, params)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Обновление моделей в день публикации Росстата без переобучения
+
+Новый месяц не меняет параметры модели заметно, поэтому вместо полной
+переоценки каждая модель, обученная на предыдущей версии ряда,
+продлевается: параметры те же, фильтр Калмана проходит только по
+новым месяцам от её конечного состояния (modeling.extend_sarima).
+Затронуты только окна, заканчивающиеся на последнем месяце прошлой
+версии; модели на более ранних окнах не меняются.
+
+Полная переоценка (с тёплым стартом от текущих параметров) —
+когда модель прожила без неё --refit-every месяцев или при --refit.
+После обновления моделей пересобираются экспорт фронтенда и прогноз
+индикатора ИПЦ — они восстанавливают модели из model_store.
+"""
+
+import argparse
+import time
+
+import model_store
+from data import read_ipc
+from modeling import extend_sarima, fit_sarima
+
+REFIT_EVERY = 12
+MAX_NEW_MONTHS = 12
+
+
+def previous_version(series, max_new_months=MAX_NEW_MONTHS):
+    """(число новых месяцев, хэш) ближайшей предыдущей версии ряда с обученными моделями
+
+    None, если таких версий нет.
+    """
+    for new_months in range(1, min(max_new_months, len(series) - 1) + 1):
+        dhash = model_store.data_hash(series.iloc[:-new_months])
+        if model_store.fitted_orders(dhash):
+            return new_months, dhash
+    return None
+
+
+def affected_windows(series, new_months, source):
+    """Окна прошлой версии, которые продлеваются: {хэш окна: начало}
+
+    Весь ряд и зарегистрированные окна, заканчивающиеся на последнем
+    месяце прошлой версии.
+    """
+    old_end = str(series.index[-1 - new_months].date())
+    windows = {source: str(series.index[0].date())}
+    for dhash, (start, end) in model_store.registered_windows(source).items():
+        if end == old_end:
+            windows[dhash] = start
+    return windows
+
+
+def update_models(series, refit_every=REFIT_EVERY, refit=False, max_new_months=MAX_NEW_MONTHS):
+    """Продление (или переоценка) всех затронутых моделей; возвращает отчёт по моделям"""
+    found = previous_version(series, max_new_months)
+    if found is None:
+        return []
+    new_months, old_source = found
+    source = model_store.data_hash(series)
+    end = str(series.index[-1].date())
+
+    report = []
+    for old_hash, start in affected_windows(series, new_months, old_source).items():
+        window = series[start:end]
+        dhash = model_store.data_hash(window)
+        model_store.register_window(source, dhash, start, end)
+        for order, seasonal_order in model_store.fitted_orders(old_hash):
+            if model_store.load_params(dhash, order, seasonal_order) is not None:
+                continue
+            base = model_store.load_params(old_hash, order, seasonal_order)
+            started = time.perf_counter()
+            if refit or base.get('extended_months', 0) + new_months >= refit_every:
+                fit_sarima(window, order, seasonal_order, warm_start=base)
+                mode = 'refit'
+            else:
+                extend_sarima(window, new_months, order, seasonal_order, base, old_hash)
+                mode = 'extend'
+            report.append({'window': [start, end], 'order': order, 'seasonal_order': seasonal_order,
+                           'mode': mode, 'new_months': new_months,
+                           'ms': round((time.perf_counter() - started) * 1000, 1)})
+    return report
+
+
+def refresh_artifacts():
+    """Экспорт фронтенда и прогноз индикатора ИПЦ (стадии без изменений пропускаются)"""
+    from export import export
+    from indicators import fit_indicator, plan
+
+    report = export()
+    for indicator, _ in plan(['cpi']):
+        fit_indicator(indicator)
+        report[f'indicators/{indicator.code}'] = True
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обновление моделей новыми месяцами без переобучения')
+    parser.add_argument('xlsx', nargs='*', help='новые выгрузки Росстата (сначала загружаются ingest.py)')
+    parser.add_argument('--refit-every', type=int, default=REFIT_EVERY,
+                        help='полная переоценка после стольких месяцев продлений')
+    parser.add_argument('--refit', action='store_true', help='переоценить все затронутые модели')
+    parser.add_argument('--no-export', action='store_true', help='не обновлять экспорт и индикаторы')
+    args = parser.parse_args()
+
+    if args.xlsx:
+        from ingest import ingest
+        for path in args.xlsx:
+            print(f'{path}: добавлено месяцев: {ingest(path)}')
+
+    report = update_models(read_ipc()['ipc'], args.refit_every, args.refit)
+    for row in report:
+        action = 'переоценена' if row['mode'] == 'refit' else f"продлена на {row['new_months']} мес."
+        print(f"SARIMA{row['order']}x{row['seasonal_order']} [{row['window'][0]} — {row['window'][1]}]: "
+              f"{action} за {row['ms']} мс")
+    if not report:
+        print('Все модели актуальны')
+
+    if not args.no_export:
+        for stage, done in refresh_artifacts().items():
+            print(f"{stage}: {'обновлено' if done else 'без изменений'}")
+
+
+if __name__ == "__main__":
+    main()
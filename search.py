@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Автоматический подбор порядка SARIMA
+
+Сетка (p,d,q)(P,D,Q,s) перебирается параллельно в пуле процессов
+в два этапа: короткие прогоны оптимизатора отсеивают заведомо слабых
+кандидатов, полное обучение получают только лучшие — фиксированное
+число TOP_K по каждому критерию в каждой группе дифференцирования,
+независимо от размера сетки. Полностью обученные модели попадают
+в model_store, результаты отсева и итоговый рейтинг — тоже. Оба этапа
+хранят AIC и BIC сразу, поэтому кэш не зависит от критерия: рейтинг
+сортируется при чтении (rank).
+
+Правдоподобие модели с d, D > 0 считается по продифференцированному
+ряду, поэтому AIC/BIC моделей с разным дифференцированием несравнимы:
+отбор и рейтинг идут внутри групп (d, D, s) — см. diff_group.
+"""
+
+import argparse
+import hashlib
+import itertools
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import model_store
+from data import IPC_CSV, read_ipc
+from modeling import build_model, fit_sarima
+
+CRITERIA = ('aic', 'bic')
+TOP_K = 5           # полностью обучаемых кандидатов на критерий в каждой группе
+
+
+def order_grid(max_p=5, max_q=5, max_P=3, max_Q=3,
+               d_values=(0, 1), D_values=(0, 1), s_values=(12, 6, 4, 3), max_diff=2):
+    """Кандидаты (order, seasonal_order); суммарное дифференцирование d + D <= max_diff"""
+    for s, d, D in itertools.product(s_values, d_values, D_values):
+        if d + D > max_diff:
+            continue
+        for p, q, P, Q in itertools.product(range(max_p + 1), range(max_q + 1),
+                                            range(max_P + 1), range(max_Q + 1)):
+            yield (p, d, q), (P, D, Q, s)
+
+
+def _grid_key(kind, candidates, *settings):
+    raw = repr((sorted(candidates), *settings)).encode()
+    return f'{kind}-{hashlib.sha256(raw).hexdigest()[:12]}'
+
+
+def diff_group(order, seasonal_order):
+    """Группа дифференцирования (d, D, s), внутри которой сравнимы AIC/BIC
+
+    Период s меняет ряд только при сезонной разности (D > 0),
+    при D = 0 он в группу не входит (0).
+    """
+    d, D, s = order[1], seasonal_order[1], seasonal_order[3]
+    return d, D, s if D else 0
+
+
+def _row_group(row):
+    return diff_group(row['order'], row['seasonal_order'])
+
+
+def rank(leaderboard, criterion, group=None):
+    """Рейтинг по критерию aic/bic внутри групп дифференцирования
+
+    group — только модели этой группы (diff_group); без неё — все
+    группы подряд, каждая отсортирована по критерию.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f'Неизвестный критерий: {criterion}')
+    if group is not None:
+        leaderboard = [r for r in leaderboard if _row_group(r) == tuple(group)]
+    return sorted(leaderboard, key=lambda r: (_row_group(r), r[criterion]))
+
+
+def groups(leaderboard):
+    """Группы дифференцирования, представленные в рейтинге"""
+    return sorted({_row_group(r) for r in leaderboard})
+
+
+def _screen(data, candidate, maxiter):
+    """Короткий прогон оптимизатора (этап отсева)"""
+    try:
+        res = build_model(data, *candidate).fit(disp=False, maxiter=maxiter)
+        return candidate, float(res.aic), float(res.bic)
+    except Exception:
+        return candidate, math.inf, math.inf
+
+
+def _screen_chunk(args):
+    data, candidates, maxiter = args
+    return [_screen(data, c, maxiter) for c in candidates]
+
+
+def _fit_chunk(args):
+    data, candidates = args
+    return [_fit_full(data, c) for c in candidates]
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _fit_full(data, candidate):
+    """Полное обучение кандидата (с сохранением в model_store)"""
+    try:
+        res = fit_sarima(data, *candidate)
+        retvals = getattr(res, 'mle_retvals', None) or {}
+        return {
+            'order': list(candidate[0]),
+            'seasonal_order': list(candidate[1]),
+            'aic': float(res.aic),
+            'bic': float(res.bic),
+            'converged': bool(retvals.get('converged', True)),
+        }
+    except Exception:
+        return None
+
+
+def _finalists(screened, top_k):
+    """Лучшие top_k по AIC и по BIC после отсева в каждой группе дифференцирования"""
+    by_group = {}
+    for r in screened:
+        by_group.setdefault(diff_group(*r[0]), []).append(r)
+    finalists = {}
+    for _, rows in sorted(by_group.items()):
+        for index in (1, 2):
+            ranked = sorted((r for r in rows if math.isfinite(r[index])), key=lambda r: r[index])
+            finalists.update((r[0], None) for r in ranked[:top_k])
+    return list(finalists)
+
+
+def search_orders(data, candidates=None, criterion='aic', screen_iter=10, top_k=TOP_K,
+                  max_workers=None, executor=None):
+    """Параллельный подбор порядка SARIMA
+
+    Возвращает список моделей, отсортированный по criterion (aic/bic)
+    внутри групп дифференцирования (см. rank).
+    executor — объект с методом map (общая очередь обучений дашборда,
+    max_workers — её число процессов); без него создаётся свой пул.
+    Задачи — пачки кандидатов вместе с рядом, без инициализатора пула.
+    Результаты отсева и полного обучения сохраняются на диск без
+    привязки к критерию и при повторном вызове с теми же данными
+    и сеткой читаются без перебора.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f'Неизвестный критерий: {criterion}')
+    candidates = [tuple(map(tuple, c)) for c in (candidates or order_grid())]
+
+    dhash = model_store.data_hash(data)
+    grid_key = _grid_key('grid', candidates, screen_iter, top_k, 'by-diff-group')
+    leaderboard = model_store.load_leaderboard(dhash, grid_key)
+    if leaderboard is not None:
+        return rank(leaderboard, criterion)
+
+    # Уже обученные модели не перебираются повторно
+    known = {}
+    for candidate in candidates:
+        stored = model_store.load_params(dhash, *candidate)
+        if stored is not None:
+            known[candidate] = stored
+    pending = [c for c in candidates if c not in known]
+
+    # Результаты отсева прошлых запусков на той же сетке
+    screen_key = _grid_key('screen', candidates, screen_iter)
+    screened = {(tuple(o), tuple(so)): (aic, bic)
+                for o, so, aic, bic in model_store.load_leaderboard(dhash, screen_key) or []}
+    unscreened = [c for c in pending if c not in screened]
+
+    workers = max_workers or os.cpu_count() or 1
+    if executor is not None:
+        pool_context = nullcontext(executor)
+    else:
+        pool_context = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    with pool_context as pool:
+        # Этап 1: отсев по коротким прогонам
+        if unscreened:
+            chunksize = max(1, len(unscreened) // (workers * 8))
+            tasks = [(data, chunk, screen_iter) for chunk in _chunks(unscreened, chunksize)]
+            for chunk in pool.map(_screen_chunk, tasks):
+                screened.update((c, (aic, bic)) for c, aic, bic in chunk)
+            model_store.save_leaderboard(dhash, screen_key,
+                                         [[list(o), list(so), aic, bic] for (o, so), (aic, bic) in screened.items()])
+
+        # Этап 2: полное обучение лучших top_k по каждому критерию в каждой группе
+        finalists = _finalists([(c, *screened[c]) for c in pending], top_k)
+        fitted = pool.map(_fit_chunk, [(data, [c]) for c in finalists])
+        results = [r for chunk in fitted for r in chunk if r is not None]
+
+    for candidate, stored in known.items():
+        results.append({
+            'order': list(candidate[0]),
+            'seasonal_order': list(candidate[1]),
+            'aic': stored['aic'],
+            'bic': stored['bic'],
+            'converged': stored.get('converged', True),
+        })
+
+    model_store.save_leaderboard(dhash, grid_key, results)
+    return rank(results, criterion)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Автоматический подбор порядка SARIMA')
+    parser.add_argument('--csv', default=IPC_CSV)
+    parser.add_argument('--criterion', choices=CRITERIA, default='aic')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=3, help='моделей на группу дифференцирования')
+    args = parser.parse_args()
+
+    df = read_ipc(args.csv)
+    leaderboard = search_orders(df['ipc'], criterion=args.criterion, max_workers=args.workers)
+    for group in groups(leaderboard):
+        d, D, s = group
+        print(f"d={d}, D={D}" + (f", s={s}" if D else ''))
+        for row in rank(leaderboard, args.criterion, group)[:args.top]:
+            print(f"  SARIMA{tuple(row['order'])}x{tuple(row['seasonal_order'])}  "
+                  f"AIC={row['aic']:.2f}  BIC={row['bic']:.2f}")
+
+
+if __name__ == "__main__":
+    main()